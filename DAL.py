@@ -1,70 +1,1145 @@
+import atexit
+import csv
+import json
+import queue
 import sqlite3
 import os
+import threading
+import time
+from urllib.parse import quote
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from collections.abc import Mapping
+from itertools import islice
 
 DB_FILE = 'projects.db'
 
-def init_db():
-    """Create DB/table if missing."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            image_file_name TEXT NOT NULL
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def get_projects():
-    """Return rows (latest first) as dicts/Rows."""
-    conn = sqlite3.connect(DB_FILE)
+# Connection settings applied once when a pooled connection is opened
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 268435456),   # 256 MB
+    ('cache_size', -16000),     # ~16 MB (negative = KiB)
+    ('busy_timeout', 5000),     # ms
+)
+
+# Maximum number of idle connections kept for reuse
+POOL_SIZE = 8
+
+# Default and maximum number of projects per listing page
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Rows per transaction for bulk imports and per fetch for exports
+BULK_CHUNK_SIZE = 5000
+
+# Columns a caller may select with the ``fields`` argument of the listing reads
+PROJECT_FIELDS = (
+    'id', 'title', 'description', 'image_file_name', 'created_at', 'updated_at', 'version',
+)
+
+# Columns written by export_projects and read back by read_projects
+EXPORT_FIELDS = ('id', 'title', 'description', 'image_file_name')
+
+# Markers search_projects puts around matched terms in titles and snippets
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# Most queued writes the writer thread commits in one transaction
+WRITE_BATCH_SIZE = 256
+
+# Listing orders: name -> (sort column, collation, newest/last first)
+SORTS = {
+    'newest': ('id', None, True),  # ids are assigned in creation order
+    'updated': ('updated_at', None, True),
+    'title': ('title', 'NOCASE', False),
+}
+DEFAULT_SORT = 'newest'
+
+# Characters of description kept in listing rows; the rest is cut in SQL
+EXCERPT_LENGTH = 200
+
+# SQL expression for the current UTC time, to the millisecond
+NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+# The same, offset by a bound modifier such as '+60.000 seconds' (see _later)
+LATER = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now', ?)"
+
+# Schema revision _migrate brings a database to; kept in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+# Where reads go: the primary connection, a read-only connection to the same
+# file (its own WAL snapshot), or a replica copied with the backup API
+READ_MODES = ('primary', 'readonly', 'replica')
+
+# Most seconds the replica may trail the primary before it is refreshed
+REPLICA_INTERVAL = 5.0
+
+# Background job queue (see inbox.py): jobs leased per claim, seconds a
+# claimed job stays hidden from other workers, failures before a job is
+# marked dead, and the first retry delay, which doubles on each failure
+JOB_BATCH_SIZE = 32
+JOB_LEASE = 60.0
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 2.0
+
+# Read cache bounds: number of cached results and seconds each stays valid
+CACHE_SIZE = 128
+CACHE_TTL = 60.0
+
+_pool = []  # idle (db_file, connection) pairs
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+_version = 0  # bumped whenever projects.db may have changed
+_version_lock = threading.Lock()
+
+_writer = None  # WriteQueue while write-behind mode is on
+
+_migrated = set()  # database files whose schema this process has checked
+_schema_lock = threading.Lock()
+
+_read_mode = 'primary'
+_replica = None  # Replica while replica mode is on
+
+
+class StaleProjectError(Exception):
+    """An update's expected version no longer matches the stored row."""
+
+    def __init__(self, project_id, expected_version):
+        super().__init__(f'Project {project_id} is no longer at version {expected_version}')
+        self.project_id = project_id
+        self.expected_version = expected_version
+
+
+Job = namedtuple('Job', 'id kind ref_id attempts')
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with a TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait and get the same result (or exception) instead of repeating
+    the work. Nothing is kept afterwards, so pair it with a cache.
+    """
+
+    def __init__(self):
+        self.shared = 0  # calls answered with another caller's result
+        self._calls = {}  # key -> Future of the call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        """Return func(*args), or the result of the same key's call in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = func(*args)
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# Cached get_projects results, keyed on data_version(); concurrent misses
+# for the same key share one query through project_flight
+project_cache = LRUCache()
+project_flight = SingleFlight()
+
+
+# Listing row: the columns a list view needs, with a bounded description
+ProjectSummary = namedtuple('ProjectSummary', 'id title excerpt image_file_name')
+
+# One character past the excerpt is fetched to tell whether it was cut
+SUMMARY_COLUMNS = f'id, title, substr(description, 1, {EXCERPT_LENGTH + 1}), image_file_name'
+
+_tuple_new = tuple.__new__
+
+def _summary_row(cursor, row):
+    """Row factory building ProjectSummary tuples, marking cut excerpts with '…'."""
+    excerpt = row[2]
+    if len(excerpt) > EXCERPT_LENGTH:
+        return _tuple_new(ProjectSummary, (row[0], row[1], excerpt[:EXCERPT_LENGTH] + '…', row[3]))
+    return _tuple_new(ProjectSummary, row)
+
+
+class _Connection(sqlite3.Connection):
+    # Last PRAGMA data_version this connection reported
+    data_version = None
+
+def _connect(path=None, readonly=False):
+    """Open and configure a new connection to path (default DB_FILE).
+
+    Read-only connections open the file with ``mode=ro`` and set
+    ``query_only``, so they can neither write nor change the journal mode.
+    """
+    path = DB_FILE if path is None else path
+    if readonly:
+        conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True,
+                               check_same_thread=False, factory=_Connection)
+        conn.execute('PRAGMA query_only = 1')
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False, factory=_Connection)
     conn.row_factory = sqlite3.Row  # This makes rows accessible as dicts
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM projects ORDER BY id DESC')
-    rows = cursor.fetchall()
-    
-    conn.close()
+    for name, value in PRAGMAS:
+        if not (readonly and name == 'journal_mode'):
+            conn.execute(f'PRAGMA {name} = {value}')
+
+    if not readonly and path not in _migrated:
+        with _schema_lock:
+            _migrate(conn)
+            _migrated.add(path)
+    return conn
+
+def _pooled(slot, key, opener):
+    """Return the thread's connection in slot if it is still for key, else an idle or new one.
+
+    ``key`` identifies what the connection points at; pooled connections are
+    only handed out again for the same key.
+    """
+    conn = getattr(_local, slot, None)
+    if conn is not None:
+        if getattr(_local, slot + '_key') == key:
+            return conn
+        # DB_FILE was switched (e.g. by tests); drop the stale connection
+        setattr(_local, slot, None)
+        conn.close()
+        conn = None
+
+    with _pool_lock:
+        for i in range(len(_pool) - 1, -1, -1):
+            if _pool[i][0] == key:
+                conn = _pool.pop(i)[1]
+                break
+
+    if conn is None:
+        conn = opener()
+
+    setattr(_local, slot, conn)
+    setattr(_local, slot + '_key', key)
+    return conn
+
+def get_connection():
+    """Return the current thread's connection, reusing an idle one if possible."""
+    return _pooled('conn', DB_FILE, _connect)
+
+def get_read_connection():
+    """Return the current thread's connection for reads under the current read mode.
+
+    In 'primary' mode this is get_connection(). Otherwise it is a separate
+    read-only connection to DB_FILE ('readonly') or to the replica
+    ('replica'), so long reads never hold the primary connection a write is
+    waiting on.
+    """
+    if _read_mode == 'primary' or DB_FILE not in _migrated:
+        return get_connection()  # a read-only connection cannot create the schema
+    path = _replica.path if _replica is not None else DB_FILE
+    return _pooled('reader', ('ro', path), lambda: _connect(path, readonly=True))
+
+def release_connection(exc=None):
+    """Hand the current thread's connection back to the idle pool.
+
+    Registered as a Flask app-context teardown; safe to call when the thread
+    holds no connection.
+    """
+    for slot in ('conn', 'reader'):
+        conn = getattr(_local, slot, None)
+        if conn is None:
+            continue
+        setattr(_local, slot, None)
+
+        if conn.in_transaction:
+            conn.rollback()
+
+        with _pool_lock:
+            if len(_pool) < POOL_SIZE:
+                _pool.append((getattr(_local, slot + '_key'), conn))
+                continue
+        conn.close()
+
+def close_all():
+    """Close the current thread's connections and every idle pooled one."""
+    for slot in ('conn', 'reader'):
+        conn = getattr(_local, slot, None)
+        if conn is not None:
+            setattr(_local, slot, None)
+            conn.close()
+
+    with _pool_lock:
+        while _pool:
+            _pool.pop()[1].close()
+
+def _bump_version():
+    global _version
+    with _version_lock:
+        _version += 1
+
+def data_version():
+    """Return a token that changes whenever projects.db may have changed.
+
+    Writes made through this module bump an in-process counter. Commits by
+    other connections or processes are detected through each connection's
+    ``PRAGMA data_version``, so cached reads stay correct when several
+    workers share the database file. The check runs on the connection reads
+    use, so a replica refresh also changes the token.
+    """
+    conn = get_read_connection()
+    seen = conn.execute('PRAGMA data_version').fetchone()[0]
+    if conn.data_version != seen:
+        # A connection's first check also counts: it cannot tell what changed
+        # before it was opened
+        conn.data_version = seen
+        _bump_version()
+    return (DB_FILE, _version)
+
+class Replica:
+    """A copy of DB_FILE kept fresh with SQLite's online backup API.
+
+    A daemon thread copies the primary into ``path`` whenever the primary has
+    changed and the copy is ``interval`` seconds old. The replica runs in WAL
+    mode, so readers keep their snapshot while a refresh is written and never
+    block it. The time each copy was taken is stored in the replica itself,
+    so every process reading it can report the same lag.
+    """
+
+    def __init__(self, path, interval=REPLICA_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.refreshes = 0
+        self.last_duration = None
+        self.last_error = None
+        self._source = None
+        self._source_version = None
+        self._confirmed_at = 0.0  # last time the primary was seen unchanged
+        self._stop = threading.Event()
+        self.refresh()  # readers need the file to exist
+        self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='dal-replica', daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        """Copy the primary into the replica now, if it changed since the last copy."""
+        if self._source is None:
+            self._source = _connect()
+        started = time.time()
+        seen = self._source.execute('PRAGMA data_version').fetchone()[0]
+        if seen == self._source_version:
+            self._confirmed_at = started
+            return False
+
+        dest = sqlite3.connect(self.path)
+        try:
+            dest.execute('PRAGMA journal_mode = WAL')
+            self._source.backup(dest)
+            with dest:
+                dest.execute('CREATE TABLE IF NOT EXISTS replica_meta (refreshed_at REAL NOT NULL)')
+                dest.execute('DELETE FROM replica_meta')
+                dest.execute('INSERT INTO replica_meta VALUES (?)', (started,))
+            dest.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        finally:
+            dest.close()
+        self._source_version = seen
+        self._confirmed_at = started
+        self.refreshes += 1
+        self.last_duration = time.time() - started
+        return True
+
+    def lag(self):
+        """Return how many seconds the replica may trail the primary."""
+        row = get_read_connection().execute('SELECT refreshed_at FROM replica_meta').fetchone()
+        refreshed_at = max(row[0] if row else 0.0, self._confirmed_at)
+        return max(0.0, time.time() - refreshed_at)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as exc:  # keep serving the last good copy
+                self.last_error = repr(exc)
+        release_connection()
+
+    def close(self):
+        """Stop refreshing and close the connection to the primary."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+def set_read_mode(mode, replica_file=None, interval=REPLICA_INTERVAL):
+    """Route listing, search and lookup reads; writes always use the primary.
+
+    ``mode`` is one of READ_MODES. 'replica' copies DB_FILE to
+    ``replica_file`` (default: DB_FILE with a ``.replica`` suffix) and keeps
+    it at most about ``interval`` seconds behind.
+    """
+    global _read_mode, _replica
+    if mode not in READ_MODES:
+        raise ValueError(f'Unknown read mode: {mode}')
+    if _replica is not None:
+        _replica.close()
+        _replica = None
+    if mode == 'replica':
+        root, ext = os.path.splitext(DB_FILE)
+        _replica = Replica(replica_file or f'{root}.replica{ext}', interval)
+    _read_mode = mode
+    project_cache.clear()
+
+def replica_status():
+    """Return the read mode and, in replica mode, the replica's lag and refresh stats."""
+    status = {'mode': _read_mode}
+    if _replica is not None:
+        status.update(
+            path=_replica.path,
+            interval=_replica.interval,
+            lag=_replica.lag(),
+            refreshes=_replica.refreshes,
+            last_duration=_replica.last_duration,
+            last_error=_replica.last_error,
+        )
+    return status
+
+def _after_fork():
+    # Threads do not survive fork (e.g. gunicorn --preload); restart ours
+    global _writer
+    if _replica is not None:
+        # PRAGMA data_version is per connection and a new one starts over,
+        # so the parent's last value says nothing about the child's source
+        _replica._source = None
+        _replica._source_version = None
+        _replica._confirmed_at = 0.0
+        _replica._start()
+    if _writer is not None:
+        _writer = WriteQueue(_writer.batch_size)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+def _migrate(conn):
+    """Bring conn's database up to SCHEMA_VERSION; return True if anything ran.
+
+    Current databases cost one PRAGMA read. Otherwise the migration runs in
+    one IMMEDIATE transaction, so when several processes start at once one
+    migrates and the others wait, re-check and find nothing to do.
+    """
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            conn.rollback()
+            return False
+
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                image_file_name TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT ({NOW}),
+                updated_at TEXT NOT NULL DEFAULT ({NOW}),
+                version INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(projects)')}
+        if 'created_at' not in columns:
+            # Tables from before timestamps: SQLite cannot add a column with
+            # a non-constant default, so backfill rows with the current time
+            conn.execute('ALTER TABLE projects ADD COLUMN created_at TEXT')
+            conn.execute('ALTER TABLE projects ADD COLUMN updated_at TEXT')
+            # Recreated below to fire only on indexed columns, so the
+            # backfill does not rewrite the full-text index
+            conn.execute('DROP TRIGGER IF EXISTS projects_fts_au')
+            conn.execute(f'UPDATE projects SET created_at = {NOW}, updated_at = {NOW}')
+        if 'version' not in columns:
+            # Bumped by every update; detail ETags and If-Match checks use it
+            conn.execute('ALTER TABLE projects ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+        # One index per non-primary-key order; each also serves the keyset
+        # cursor, and the title index serves prefix filters
+        conn.execute('CREATE INDEX IF NOT EXISTS projects_title_idx ON projects (title COLLATE NOCASE, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS projects_updated_idx ON projects (updated_at, id)')
+
+        # Full-text index over title/description, kept in sync by triggers.
+        # Statements run one by one: executescript would commit mid-migration
+        has_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'projects_fts'").fetchone()
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+                title, description, content='projects', content_rowid='id'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN
+                INSERT INTO projects_fts (rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS projects_fts_ad AFTER DELETE ON projects BEGIN
+                INSERT INTO projects_fts (projects_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS projects_fts_au
+            AFTER UPDATE OF title, description ON projects BEGIN
+                INSERT INTO projects_fts (projects_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO projects_fts (rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        ''')
+        if not has_fts:
+            # Index rows that existed before the FTS table did
+            conn.execute("INSERT INTO projects_fts (projects_fts) VALUES ('rebuild')")
+
+        # Contact form submissions; status moves from 'new' to 'delivered',
+        # 'spam' or 'duplicate' once a worker has processed the message
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT ({NOW}),
+                status TEXT NOT NULL DEFAULT 'new',
+                spam_score REAL,
+                fingerprint TEXT,
+                processed_at TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS messages_fingerprint_idx ON messages (fingerprint, created_at)')
+
+        # Persistent job queue: a job is due once run_after has passed, and
+        # claiming it pushes run_after out by the lease
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                ref_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after TEXT NOT NULL DEFAULT ({NOW}),
+                last_error TEXT
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_due_idx ON jobs (kind, run_after) WHERE state = 'queued'")
+
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return True
+
+def init_db():
+    """Create or migrate the schema now if PRAGMA user_version says it is out of date.
+
+    Optional: every process migrates a database lazily when it first opens
+    a read-write connection to it.
+    """
+    _migrate(get_connection())
+    _bump_version()
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+    words = [w.replace('"', '') for w in text.split()]
+    words = [f'"{w}"' for w in words if w]
+    if not words:
+        return None
+    words[-1] += '*'
+    return ' '.join(words)
+
+def search_projects(query, limit=PAGE_SIZE):
+    """Return projects matching free-text query, best bm25 match first.
+
+    Rows also carry ``title_html`` and ``snippet`` with matches wrapped in
+    HIGHLIGHT_START/HIGHLIGHT_END markers (the text itself is not escaped).
+    """
+    fts_query = _fts_query(query)
+    if fts_query is None:
+        return []
+
+    conn = get_read_connection()
+    cursor = conn.execute('''
+        SELECT p.id, p.title, p.description, p.image_file_name,
+               highlight(projects_fts, 0, :start, :end) AS title_html,
+               snippet(projects_fts, 1, :start, :end, '…', 24) AS snippet
+        FROM projects_fts
+        JOIN projects p ON p.id = projects_fts.rowid
+        WHERE projects_fts MATCH :query
+        ORDER BY rank
+        LIMIT :limit
+    ''', {'start': HIGHLIGHT_START, 'end': HIGHLIGHT_END, 'query': fts_query, 'limit': limit})
+    return cursor.fetchall()
+
+def _listing_query(after_id=None, before_id=None, sort=DEFAULT_SORT, prefix=None, columns='*'):
+    """Return (sql, params) for one keyset page in sort order.
+
+    The query selects ``columns`` and takes a ``:limit`` parameter. ``before_id`` pages are selected
+    in reverse; callers flip them back. Cursors are project ids: for sorts
+    other than the primary key the cursor row's sort value is looked up, so
+    a cursor whose row has since been deleted yields an empty page.
+    """
+    if sort not in SORTS:
+        raise ValueError(f'Unknown sort: {sort}')
+    if prefix and sort != 'title':
+        raise ValueError('A title prefix filter needs the title sort')
+    column, collation, descending = SORTS[sort]
+    collate = f' COLLATE {collation}' if collation else ''
+
+    cursor_id = before_id if before_id is not None else after_id
+    ascending = descending == (before_id is not None)
+    op, direction = ('>', 'ASC') if ascending else ('<', 'DESC')
+
+    where, params = [], {}
+    if cursor_id is not None:
+        params['cursor'] = cursor_id
+        if column == 'id':
+            where.append(f'id {op} :cursor')
+        else:
+            # Row values compare (sort value, id) pairs in one index range
+            where.append(f'({column}, id) {op} '
+                         f'((SELECT {column} FROM projects WHERE id = :cursor){collate}, :cursor)')
+    if prefix:
+        # Case-insensitive (ASCII) prefix range; the bound on the cursor's
+        # side is left out so the cursor alone starts the index range
+        params['low'], params['high'] = prefix, prefix + '\U0010ffff'
+        if cursor_id is None or not ascending:
+            where.append(f'title >= :low{collate}')
+        if cursor_id is None or ascending:
+            where.append(f'title < :high{collate}')
+
+    order = f'{column}{collate} {direction}'
+    if column != 'id':
+        order += f', id {direction}'
+    sql = f'SELECT {columns} FROM projects'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    return f'{sql} ORDER BY {order} LIMIT :limit', params
+
+def selected_columns(fields):
+    """Return the columns rows selected with ``fields`` carry, in order.
+
+    ``id`` always comes first, since keyset cursors are read from it; it is
+    added if fields does not name it. Raises ValueError for unknown fields.
+    """
+    unknown = [f for f in fields if f not in PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return ('id',) + tuple(dict.fromkeys(f for f in fields if f != 'id'))
+
+def _projects_cursor(after_id=None, before_id=None, limit=None, sort=DEFAULT_SORT, prefix=None,
+                     summary=False, fields=None):
+    """Execute the keyset listing query and return its open cursor.
+
+    With ``summary`` the cursor yields ProjectSummary rows, and with
+    ``fields`` plain tuples laid out as selected_columns(fields), instead
+    of full sqlite3.Row objects.
+    """
+    if summary:
+        columns, row_factory = SUMMARY_COLUMNS, _summary_row
+    elif fields:
+        columns, row_factory = ', '.join(selected_columns(fields)), None
+    else:
+        columns, row_factory = '*', sqlite3.Row
+    sql, params = _listing_query(after_id, before_id, sort, prefix, columns)
+    params['limit'] = -1 if limit is None else limit  # LIMIT -1 means no limit
+    # Through Connection.execute, so metrics can count and time it; a
+    # cursor's row_factory applies to rows fetched after it is set
+    cursor = get_read_connection().execute(sql, params)
+    cursor.row_factory = row_factory
+    return cursor
+
+def get_project(project_id, primary=False):
+    """Return one project with every column, or None if it does not exist.
+
+    Pass ``primary`` to bypass read routing, e.g. before an update that must
+    see the latest version.
+    """
+    conn = get_connection() if primary else get_read_connection()
+    return conn.execute(
+        'SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
+
+def get_projects(after_id=None, before_id=None, limit=None, sort=DEFAULT_SORT, prefix=None,
+                 summary=False, fields=None):
+    """Return rows (latest first) as dicts/Rows.
+
+    Keyset pagination: ``after_id`` returns rows after that project in
+    ``sort`` order, ``before_id`` rows before it, and ``limit`` caps the
+    count. ``prefix`` keeps titles starting with it (title sort only), and
+    ``summary`` returns compact ProjectSummary rows for list views, and
+    ``fields`` tuples of just those columns (see selected_columns). Every
+    page is a range scan on the primary key or an index, so its cost does
+    not grow with the table. Results are served from ``project_cache`` until
+    the data changes, and concurrent misses for the same page share one
+    query.
+    """
+    fields = tuple(fields) if fields else None
+    key = (data_version(), after_id, before_id, limit, sort, prefix, summary, fields)
+    rows = project_cache.get(key)
+    if rows is None:
+        rows = project_flight.do(key, _load_projects, key, after_id, before_id, limit, sort,
+                                 prefix, summary, fields)
+    return list(rows)
+
+def _load_projects(key, after_id, before_id, limit, sort, prefix, summary, fields):
+    rows = _projects_cursor(after_id, before_id, limit, sort, prefix, summary, fields).fetchall()
+    if before_id is not None:
+        rows.reverse()
+    rows = tuple(rows)
+    project_cache.set(key, rows)
     return rows
 
-def add_project(title, description, image_file_name):
-    """Insert one row."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO projects (title, description, image_file_name)
-        VALUES (?, ?, ?)
+def iter_projects(after_id=None, limit=None, batch_size=256, sort=DEFAULT_SORT, prefix=None,
+                  summary=False, fields=None):
+    """Yield rows in sort order straight off the cursor, batch_size at a time."""
+    cursor = _projects_cursor(after_id, None, limit, sort, prefix, summary, fields)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def get_projects_page(after_id=None, before_id=None, limit=PAGE_SIZE, sort=DEFAULT_SORT, prefix=None,
+                      summary=False, fields=None):
+    """Return (rows, prev_cursor, next_cursor) for one page of projects.
+
+    Cursors are project ids to pass back as ``before_id``/``after_id`` with
+    the same sort and prefix; a cursor is None when there is no page in that
+    direction.
+    """
+    rows = get_projects(after_id, before_id, limit + 1, sort, prefix, summary, fields)
+    has_extra = len(rows) > limit
+
+    # id is the first column of every row type
+    if before_id is not None:
+        rows = rows[1:] if has_extra else rows
+        prev_cursor = rows[0][0] if has_extra else None
+        next_cursor = rows[-1][0] if rows else None
+    else:
+        rows = rows[:limit]
+        prev_cursor = rows[0][0] if after_id is not None and rows else None
+        next_cursor = rows[-1][0] if has_extra else None
+
+    return rows, prev_cursor, next_cursor
+
+class ProjectPage:
+    """One keyset page of ProjectSummary rows, read lazily.
+
+    Iterate it once for the rows. ``prev_cursor`` is known up front;
+    ``next_cursor`` is settled when iteration finishes, which is when a
+    template that renders its pager after the rows reads it.
+    """
+
+    def __init__(self, after_id=None, before_id=None, limit=PAGE_SIZE, sort=DEFAULT_SORT, prefix=None):
+        self.limit = limit
+        self.sort = sort
+        self.prefix = prefix
+        if before_id is not None:
+            # Earlier pages are selected in reverse, so they are materialized
+            rows, self.prev_cursor, self.next_cursor = get_projects_page(
+                None, before_id, limit, sort, prefix, summary=True)
+            self._rows = iter(rows)
+        else:
+            self._rows = iter_projects(after_id, limit + 1, sort=sort, prefix=prefix, summary=True)
+            self.next_cursor = None
+        self._first = next(self._rows, None)
+        if before_id is None:
+            self.prev_cursor = self._first.id if after_id is not None and self._first else None
+
+    def __bool__(self):
+        return self._first is not None
+
+    def __iter__(self):
+        if self._first is None:
+            return
+        last, count = self._first, 1
+        yield last
+        for row in self._rows:
+            if count == self.limit:
+                # One row past the page: there is an older page
+                self.next_cursor = last.id
+                break
+            last = row
+            count += 1
+            yield row
+
+class WriteQueue:
+    """Write-behind queue drained by a single writer thread.
+
+    Each submitted write gets a Future. The writer takes everything queued
+    (up to WRITE_BATCH_SIZE), runs it in one transaction and resolves the
+    futures once it has committed, so concurrent writers share one commit
+    instead of queueing on SQLite's write lock.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='dal-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, op, *args):
+        """Queue op(conn, *args); return a Future resolved once it is committed."""
+        future = Future()
+        self._queue.put((op, args, future))
+        return future
+
+    def close(self):
+        """Commit everything already queued, then stop the writer thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if item[2].set_running_or_notify_cancel():
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+        release_connection()
+
+    def _commit(self, batch):
+        conn = get_connection()
+        try:
+            with conn:
+                for op, args, _ in batch:
+                    op(conn, *args)
+        except Exception:
+            # Retry one by one so a single bad write fails only its own future
+            for op, args, future in batch:
+                try:
+                    with conn:
+                        op(conn, *args)
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(None)
+            _bump_version()
+            return
+
+        _bump_version()
+        for _, _, future in batch:
+            future.set_result(None)
+
+def start_write_queue(batch_size=WRITE_BATCH_SIZE):
+    """Switch project mutations to write-behind mode; they return Futures."""
+    global _writer
+    if _writer is None:
+        _writer = WriteQueue(batch_size)
+        atexit.register(stop_write_queue)
+    return _writer
+
+def stop_write_queue():
+    """Flush pending writes and return to synchronous mode."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+        atexit.unregister(stop_write_queue)
+
+def _write(op, *args):
+    """Run op(conn, *args) in its own transaction, or queue it in write-behind mode.
+
+    Returns the queued write's Future, or None once a synchronous write has
+    committed.
+    """
+    writer = _writer
+    if writer is not None:
+        return writer.submit(op, *args)
+
+    conn = get_connection()
+    with conn:
+        op(conn, *args)
+    _bump_version()
+    return None
+
+def _insert_project(conn, title, description, image_file_name):
+    conn.execute(f'''
+        INSERT INTO projects (title, description, image_file_name, created_at, updated_at)
+        VALUES (?, ?, ?, {NOW}, {NOW})
     ''', (title, description, image_file_name))
-    
-    conn.commit()
-    conn.close()
 
-def delete_project(project_id):
-    """Delete a project by ID."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-    
-    conn.commit()
-    conn.close()
-
-def update_project(project_id, title, description, image_file_name):
-    """Update a project by ID."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE projects 
-        SET title = ?, description = ?, image_file_name = ?
+def _delete_project(conn, project_id):
+    conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+
+def _update_project(conn, project_id, title, description, image_file_name, expected_version=None):
+    sql = f'''
+        UPDATE projects
+        SET title = ?, description = ?, image_file_name = ?, updated_at = {NOW},
+            version = version + 1
         WHERE id = ?
-    ''', (title, description, image_file_name, project_id))
-    
-    conn.commit()
-    conn.close()
+    '''
+    params = (title, description, image_file_name, project_id)
+    if expected_version is None:
+        conn.execute(sql, params)
+        return
+    cursor = conn.execute(sql + ' AND version = ?', params + (expected_version,))
+    if cursor.rowcount == 0:
+        raise StaleProjectError(project_id, expected_version)
+
+def add_project(title, description, image_file_name):
+    """Insert one row (a Future in write-behind mode)."""
+    return _write(_insert_project, title, description, image_file_name)
+
+def delete_project(project_id):
+    """Delete a project by ID (a Future in write-behind mode)."""
+    return _write(_delete_project, project_id)
+
+def update_project(project_id, title, description, image_file_name, expected_version=None):
+    """Update a project by ID and bump its version (a Future in write-behind mode).
+
+    With ``expected_version`` the update only applies if the row is still at
+    that version; otherwise StaleProjectError is raised (or set on the
+    Future), so concurrent edits cannot silently overwrite each other.
+    """
+    return _write(_update_project, project_id, title, description, image_file_name,
+                  expected_version)
+
+def add_projects_bulk(projects, chunk_size=BULK_CHUNK_SIZE):
+    """Insert many rows, chunk_size per transaction; return the count.
+
+    ``projects`` may be any iterable (including a generator) of
+    (title, description, image_file_name) tuples or mappings with those
+    keys. It is consumed one chunk at a time, so memory stays bounded.
+    """
+    conn = get_connection()
+    rows = iter(projects)
+    total = 0
+
+    while True:
+        chunk = [_project_values(p) for p in islice(rows, chunk_size)]
+        if not chunk:
+            break
+        with conn:
+            conn.executemany(f'''
+                INSERT INTO projects (title, description, image_file_name, created_at, updated_at)
+                VALUES (?, ?, ?, {NOW}, {NOW})
+            ''', chunk)
+        _bump_version()
+        total += len(chunk)
+
+    return total
+
+def _project_values(project):
+    if isinstance(project, Mapping):
+        return (project['title'], project['description'], project['image_file_name'])
+    return tuple(project)
+
+def export_projects(stream, fmt='csv', chunk_size=BULK_CHUNK_SIZE):
+    """Write every project (oldest first) to a text stream; return the count.
+
+    ``fmt`` is 'csv' (with a header row) or 'jsonl'. Rows are fetched
+    chunk_size at a time, so memory stays bounded.
+    """
+    cursor = get_read_connection().execute(
+        'SELECT id, title, description, image_file_name FROM projects ORDER BY id')
+
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_FIELDS)
+        write = writer.writerow
+    elif fmt == 'jsonl':
+        def write(row):
+            stream.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n')
+    else:
+        raise ValueError(f'Unknown export format: {fmt}')
+
+    total = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            write(tuple(row))
+        total += len(rows)
+    return total
+
+def read_projects(stream, fmt='csv'):
+    """Yield project mappings parsed lazily from a CSV or JSON-lines stream."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+def _later(seconds):
+    """Return the LATER modifier for a time seconds from now."""
+    return f'{seconds:+.3f} seconds'
+
+def add_message(first_name, last_name, email, body):
+    """Store a contact message and queue its processing job; return its id.
+
+    Both inserts share one small transaction, so this is all a request
+    pays for: scoring, dedup and notification happen in inbox.py.
+    """
+    conn = get_connection()
+    with conn:
+        message_id = conn.execute(
+            'INSERT INTO messages (first_name, last_name, email, body) VALUES (?, ?, ?, ?)',
+            (first_name, last_name, email, body)).lastrowid
+        conn.execute("INSERT INTO jobs (kind, ref_id) VALUES ('message', ?)", (message_id,))
+    return message_id
+
+def get_messages(message_ids):
+    """Return {id: row} for the messages in message_ids that exist."""
+    ids = list(message_ids)
+    if not ids:
+        return {}
+    placeholders = ', '.join('?' * len(ids))
+    cursor = get_connection().execute(
+        f'SELECT * FROM messages WHERE id IN ({placeholders})', ids)
+    return {row['id']: row for row in cursor}
+
+def find_duplicate_message(message, fingerprint, window):
+    """Return the id of an earlier message with the same fingerprint, or None.
+
+    Only messages created within window seconds before message count.
+    """
+    row = get_connection().execute('''
+        SELECT id FROM messages
+        WHERE fingerprint = ? AND created_at >= strftime('%Y-%m-%dT%H:%M:%fZ', ?, ?)
+          AND id < ?
+        LIMIT 1
+    ''', (fingerprint, message['created_at'], _later(-window), message['id'])).fetchone()
+    return row[0] if row is not None else None
+
+def claim_jobs(kind, limit=JOB_BATCH_SIZE, lease=JOB_LEASE):
+    """Lease up to limit due jobs of kind and return them as Jobs, oldest first.
+
+    Claiming is one UPDATE, so workers in other threads or processes never
+    get the same job. A claimed job stays hidden for lease seconds: finish
+    it with finish_message_jobs or hand it back with fail_job, and if the
+    worker dies first another one picks the job up once the lease runs out.
+    """
+    conn = get_connection()
+    with conn:
+        rows = conn.execute(f'''
+            UPDATE jobs SET run_after = {LATER}, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM jobs
+                WHERE kind = ? AND state = 'queued' AND run_after <= {NOW}
+                ORDER BY run_after, id
+                LIMIT ?
+            )
+            RETURNING id, kind, ref_id, attempts
+        ''', (_later(lease), kind, limit)).fetchall()
+    return sorted(Job(*row) for row in rows)  # RETURNING order is unspecified
+
+def fail_job(job, error, max_attempts=JOB_MAX_ATTEMPTS, retry_delay=JOB_RETRY_DELAY):
+    """Reschedule a claimed job with exponential backoff, or mark it dead."""
+    conn = get_connection()
+    with conn:
+        if job.attempts >= max_attempts:
+            conn.execute("UPDATE jobs SET state = 'dead', last_error = ? WHERE id = ?",
+                         (str(error), job.id))
+        else:
+            delay = retry_delay * 2 ** (job.attempts - 1)
+            conn.execute(f'UPDATE jobs SET run_after = {LATER}, last_error = ? WHERE id = ?',
+                         (_later(delay), str(error), job.id))
+
+def finish_message_jobs(results):
+    """Record processed messages and delete their jobs in one transaction.
+
+    results holds (job, status, spam_score, fingerprint) tuples; a status of
+    None only deletes the job (its message no longer exists).
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(f'''
+            UPDATE messages SET status = ?, spam_score = ?, fingerprint = ?, processed_at = {NOW}
+            WHERE id = ?
+        ''', [(status, score, fingerprint, job.ref_id)
+              for job, status, score, fingerprint in results if status is not None])
+        conn.executemany('DELETE FROM jobs WHERE id = ?', [(job.id,) for job, *_ in results])
+
+def job_counts():
+    """Return {state: count} for the job queue, counting due jobs separately."""
+    row = get_connection().execute(f'''
+        SELECT count(*) FILTER (WHERE state = 'queued'),
+               count(*) FILTER (WHERE state = 'queued' AND run_after <= {NOW}),
+               count(*) FILTER (WHERE state = 'dead')
+        FROM jobs
+    ''').fetchone()
+    return dict(zip(('queued', 'due', 'dead'), row))
@@ -1,64 +1,519 @@
-from flask import Flask, render_template, send_from_directory, redirect, url_for, request
+import hashlib
+import json
+import os
+import time
+
+import click
+from flask import Flask, abort, current_app, jsonify, make_response, render_template, stream_template, stream_with_context, redirect, url_for, request
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
 import DAL
+import assets
+import compression
+import images
+import inbox
+import metrics
+import pages
+import ratelimit
+
+DEFAULT_CONFIG = {
+    # Stream /projects to the client while rows are still being read
+    'STREAM_PROJECTS': False,
+    # Queue project writes for a single writer thread that group-commits them
+    'WRITE_BEHIND': False,
+    # Serve /metrics (Prometheus); SERVER_TIMING adds a per-response breakdown
+    'METRICS': False,
+    'SERVER_TIMING': False,
+    # Where reads go: 'primary', 'readonly' or 'replica' (see DAL.set_read_mode)
+    'READ_MODE': 'primary',
+    'REPLICA_FILE': None,
+    'REPLICA_INTERVAL': DAL.REPLICA_INTERVAL,
+    # Render STATIC_PAGES in create_app instead of on first request; serve.py
+    # turns it on so workers (or the preloading master) do it before traffic
+    'PRERENDER_PAGES': False,
+    # Process queued contact messages in a background thread (see inbox.py);
+    # without it run `flask --app app inbox work` as a separate process
+    'INBOX_WORKER': False,
+    # Per-client token bucket for write requests: WRITE_BURST at once, then
+    # WRITE_RATE per second (0 turns it off). RATE_LIMIT_DB shares buckets
+    # between worker processes through that SQLite file (see ratelimit.py)
+    'WRITE_RATE': 0.5,
+    'WRITE_BURST': 30,
+    'RATE_LIMIT_DB': None,
+    # Reject project writes naming a file that is not in static/images/
+    'VALIDATE_IMAGES': True,
+    # Serve static files from cached open descriptors with sendfile
+    # and Range support (see assets.py); False falls back to send_file
+    'STATIC_FILE_CACHE': True,
+    # Keep compiled templates on disk so restarted workers skip Jinja's
+    # parse and compile; TEMPLATE_CACHE_DIR None is Jinja's per-user temp dir
+    'TEMPLATE_BYTECODE_CACHE': True,
+    'TEMPLATE_CACHE_DIR': None,
+}
+
+# Templates rendered once (and on edit) by pages.render_page
+STATIC_PAGES = ('index.html', 'about.html', 'resume.html', 'contact.html', 'thankyou.html')
+
+# Rendered /projects pages, keyed on DAL.data_version(), the render token and
+# the image catalog version; concurrent misses for the same page share one
+# query and render through page_flight
+page_cache = DAL.LRUCache(maxsize=64)
+page_flight = DAL.SingleFlight()
+
+# Seconds between re-reads of the template folder by _render_token(), as
+# images.Catalog does for IMAGE_DIR
+TEMPLATE_CHECK_INTERVAL = images.CHECK_INTERVAL
+
+# (signature, token) from the last _render_token() call, and the template
+# files it last saw with the time they were listed
+_last_render_token = None
+_template_files = (float('-inf'), ())
+
+# Views registered on every app by create_app
+_routes = []
+
+def route(rule, **options):
+    """Record a view function for create_app to register (like app.route)."""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def create_app(config=None):
+    """Build and configure an application instance.
+
+    Settings come from DEFAULT_CONFIG, then FLASK_-prefixed environment
+    variables (e.g. FLASK_STREAM_PROJECTS=true), then ``config``. A
+    ``DATABASE`` setting points DAL at another SQLite file.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(DEFAULT_CONFIG)
+    app.config.from_prefixed_env()
+    if config:
+        app.config.from_mapping(config)
+    if 'DATABASE' in app.config:
+        DAL.DB_FILE = app.config['DATABASE']
+
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.add_template_filter(highlight_filter, 'highlight')
+    app.cli.add_command(projects_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(inbox_cli)
+
+    # Content-hashed, long-cached URLs for css/ and static/ files
+    assets.init_app(app)
+
+    # Latency/SQL/render instrumentation; registered before compression so
+    # its after_request hook runs last and sees bytes on the wire
+    metrics.init_app(app)
+
+    # gzip/brotli for dynamic responses
+    compression.init_app(app)
+
+    # 429s for clients sending writes faster than WRITE_RATE
+    ratelimit.init_app(app)
 
-app = Flask(__name__)
+    # Responsive thumbnails for project images, generated on first use
+    app.add_template_global(images.image_set)
+    app.add_template_global(images.image_info)
+    app.add_template_global(images.image_names)
 
-# Initialize database on startup
-DAL.init_db()
+    # Bytecode is keyed on each template's source checksum, so edits still
+    # take effect; only unchanged templates are loaded precompiled
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+    # The schema is created or migrated when the first connection opens
+    # (DAL._migrate), so building the app never touches the database
+    DAL.set_read_mode(app.config['READ_MODE'], app.config['REPLICA_FILE'],
+                      app.config['REPLICA_INTERVAL'])
+    if app.config['WRITE_BEHIND']:
+        DAL.start_write_queue()  # flushed at interpreter exit
+    if app.config['INBOX_WORKER']:
+        inbox.start_worker()
+
+    # Return the request's pooled DB connection when the app context ends
+    app.teardown_appcontext(DAL.release_connection)
+
+    if app.config['PRERENDER_PAGES']:
+        pages.prerender(app, STATIC_PAGES)
+    return app
+
+def wait_for(write):
+    """Block until a DAL write is durable (it may be a write-behind Future)."""
+    if write is not None:
+        write.result()
 
 # Serve CSS files from root-level css folder
-@app.route('/css/<path:filename>')
+@route('/css/<path:filename>')
 def css_file(filename):
-    return send_from_directory('css', filename)
+    return assets.send_asset('css_file', filename)
 
 # Pages
-@app.route('/')
+@route('/')
 def home():
-    return render_template('index.html')
+    return pages.render_page('index.html')
 
-@app.route('/about')
+@route('/about')
 def about():
-    return render_template('about.html')
+    return pages.render_page('about.html')
 
-@app.route('/projects')
+def _listing_args():
+    """Return (after_id, before_id, limit, sort, prefix) from the query string."""
+    after_id = request.args.get('cursor', type=int)
+    before_id = request.args.get('before', type=int)
+    limit = request.args.get('limit', DAL.PAGE_SIZE, type=int)
+    limit = max(1, min(limit, DAL.MAX_PAGE_SIZE))
+    sort = request.args.get('sort', DAL.DEFAULT_SORT)
+    if sort not in DAL.SORTS:
+        sort = DAL.DEFAULT_SORT
+    prefix = request.args.get('prefix', '').strip() or None
+    if prefix:
+        sort = 'title'  # prefix matches are served from the title index
+    return after_id, before_id, limit, sort, prefix
+
+@route('/projects')
 def projects():
-    projects_data = DAL.get_projects()
-    return render_template('projects.html', projects=projects_data)
+    after_id, before_id, limit, sort, prefix = _listing_args()
+
+    # Carried over into pager links; defaults are left out of URLs
+    filters = {}
+    if sort != DAL.DEFAULT_SORT:
+        filters['sort'] = sort
+    if prefix:
+        filters['prefix'] = prefix
+
+    if current_app.config['STREAM_PROJECTS']:
+        page = DAL.ProjectPage(after_id, before_id, limit, sort, prefix)
+        return stream_template('projects.html', projects=page, filters=filters)
+
+    key = (DAL.data_version(), _render_token(), images.catalog_version(),
+           after_id, before_id, limit, sort, prefix)
+    cached = page_cache.get(key)
+    if cached is None:
+        cached = page_flight.do(key, _render_projects, key, filters)
+
+    html, etag = cached
+    response = make_response(html)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _render_projects(key, filters):
+    """Render the /projects page for a page_cache key and cache (html, etag)."""
+    after_id, before_id, limit, sort, prefix = key[3:]
+    page = DAL.ProjectPage(after_id, before_id, limit, sort, prefix)
+    html = render_template('projects.html', projects=page, filters=filters)
+    cached = (html, hashlib.sha256(html.encode('utf-8')).hexdigest()[:16])
+    page_cache.set(key, cached)
+    return cached
+
+def _ndjson_lines(rows, columns, fields, batch_size=256):
+    """Encode rows as NDJSON, yielding batch_size lines per chunk."""
+    batch = []
+    for row in rows:
+        record = {name: value for name, value in zip(columns, row) if name in fields}
+        batch.append(json.dumps(record, ensure_ascii=False))
+        if len(batch) == batch_size:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+@route('/api/projects')
+def projects_api():
+    """List projects as a JSON page, or stream them all as NDJSON.
+
+    Takes the /projects listing parameters plus ``fields`` (comma-separated
+    columns). NDJSON (``format=ndjson`` or ``Accept: application/x-ndjson``)
+    runs from ``cursor`` to the end of the listing, or for ``limit`` rows,
+    reading the SQLite cursor in batches so memory stays flat.
+    """
+    after_id, before_id, limit, sort, prefix = _listing_args()
+    fields = tuple(f.strip() for f in request.args.get('fields', '').split(',') if f.strip())
+    fields = fields or DAL.PROJECT_FIELDS
+    try:
+        columns = DAL.selected_columns(fields)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+              == 'application/x-ndjson')
+    if ndjson:
+        rows = DAL.iter_projects(after_id, request.args.get('limit', type=int),
+                                 sort=sort, prefix=prefix, fields=fields)
+        return current_app.response_class(
+            stream_with_context(_ndjson_lines(rows, columns, fields)),
+            mimetype='application/x-ndjson')
+
+    rows, prev_cursor, next_cursor = DAL.get_projects_page(
+        after_id, before_id, limit, sort, prefix, fields=fields)
+    response = jsonify(
+        projects=[{name: value for name, value in zip(columns, row) if name in fields} for row in rows],
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
+    )
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
-@app.route('/resume')
+def _project_or_404(project_id, primary=False):
+    project = DAL.get_project(project_id, primary)
+    if project is None:
+        abort(404)
+    return project
+
+def _project_fields(data):
+    """Return stripped (title, description, image_file_name) from a form or JSON mapping."""
+    return tuple(str(data.get(name) or '').strip()
+                 for name in ('title', 'description', 'image_file_name'))
+
+def _unknown_image(image_file_name):
+    """Return whether VALIDATE_IMAGES is on and the image catalog lacks image_file_name."""
+    return current_app.config['VALIDATE_IMAGES'] and not images.is_valid_image(image_file_name)
+
+def _project_etag(project, suffix=''):
+    """ETag of a project representation; it changes whenever the row's version does."""
+    return f"{project['id']}.{project['version']}{suffix}"
+
+def _render_token():
+    """Return a digest of what every rendered page shares besides its data.
+
+    That is the template files (by mtime and size, as pages.py tracks them)
+    and the asset fingerprints the pages link, so editing a template or a
+    stylesheet changes the ETag of pages rendered from them. The template
+    folder is listed at most once per TEMPLATE_CHECK_INTERVAL.
+    """
+    global _last_render_token, _template_files
+    now = time.monotonic()
+    checked_at, files = _template_files
+    if now - checked_at >= TEMPLATE_CHECK_INTERVAL:
+        folder = os.path.join(current_app.root_path, current_app.template_folder)
+        listing = []
+        for entry in os.scandir(folder):
+            if entry.is_file():
+                st = entry.stat()
+                listing.append((entry.name, st.st_mtime_ns, st.st_size))
+        files = tuple(sorted(listing))
+        _template_files = (now, files)
+    signature = (assets.manifest_digest(), *files)
+    last = _last_render_token
+    if last is None or last[0] != signature:
+        last = _last_render_token = (
+            signature, hashlib.sha256(repr(signature).encode()).hexdigest()[:8])
+    return last[1]
+
+def _page_etag(project):
+    """ETag of a project's HTML page: its version, the render token and its image."""
+    info = images.image_info(project['image_file_name'])
+    image = info.digest[:8] if info else '-'
+    return _project_etag(project, f'.{_render_token()}.{image}.html')
+
+def _etag_variants(etag):
+    # compression.py appends the content coding to ETags it encodes
+    return (etag, f'{etag}-br', f'{etag}-gzip')
+
+def _not_modified(etag):
+    """Return a 304 if the client already holds etag in any coding, before rendering."""
+    for tag in _etag_variants(etag):
+        if request.if_none_match.contains_weak(tag):
+            response = make_response('', 304)
+            response.set_etag(tag)
+            response.cache_control.no_cache = True
+            response.vary.add('Accept-Encoding')
+            return response
+    return None
+
+def _if_match(etag):
+    """Return True unless If-Match is sent and names none of etag's variants."""
+    return not request.if_match or any(tag in request.if_match for tag in _etag_variants(etag))
+
+def _revalidate(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@route('/projects/<int:project_id>')
+def project(project_id):
+    project = _project_or_404(project_id)
+    etag = _page_etag(project)
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return _revalidate(make_response(render_template('project.html', project=project)), etag)
+
+@route('/projects/<int:project_id>/edit', methods=['GET', 'POST'])
+@ratelimit.limit_writes
+def edit_project(project_id):
+    project = _project_or_404(project_id, primary=True)
+    if request.method == 'POST':
+        fields = _project_fields(request.form)
+        if all(fields):
+            if _unknown_image(fields[2]):
+                return render_template('form.html', project=project, values=request.form,
+                                       image_error=fields[2]), 400
+            try:
+                wait_for(DAL.update_project(project_id, *fields,
+                                            expected_version=request.form.get('version', type=int)))
+            except DAL.StaleProjectError:
+                # Someone saved first: show their version instead of overwriting it
+                latest = _project_or_404(project_id, primary=True)
+                return render_template('form.html', project=latest, conflict=True), 409
+            images.image_set(fields[2])
+            return redirect(url_for('project', project_id=project_id))
+
+    return render_template('form.html', project=project)
+
+@route('/api/projects/<int:project_id>', methods=['GET', 'PUT'])
+@ratelimit.limit_writes
+def project_api(project_id):
+    # Edits compare against the latest version, so they read the primary
+    project = _project_or_404(project_id, primary=request.method == 'PUT')
+    etag = _project_etag(project)
+
+    if request.method == 'PUT':
+        if not _if_match(etag):
+            return jsonify(error='Project has changed; fetch it again'), 412
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify(error='The request body must be a JSON object'), 400
+        fields = _project_fields(data)
+        if not all(fields):
+            return jsonify(error='title, description and image_file_name are required'), 400
+        if _unknown_image(fields[2]):
+            return jsonify(error=f'No image named {fields[2]!r} in static/images/'), 400
+        expected_version = project['version'] if request.if_match else None
+        try:
+            wait_for(DAL.update_project(project_id, *fields, expected_version=expected_version))
+        except DAL.StaleProjectError:
+            return jsonify(error='Project has changed; fetch it again'), 412
+        project = _project_or_404(project_id, primary=True)
+        response = jsonify(dict(project))
+        response.set_etag(_project_etag(project))
+        return response
+
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return _revalidate(jsonify(dict(project)), etag)
+
+@route('/projects/search')
+def search_projects():
+    query = request.args.get('q', '').strip()
+    results = DAL.search_projects(query) if query else []
+    return render_template('search.html', query=query, results=results)
+
+def highlight_filter(text):
+    """Escape search output and turn DAL highlight markers into <mark> tags."""
+    html = str(escape(text))
+    html = html.replace(DAL.HIGHLIGHT_START, '<mark>').replace(DAL.HIGHLIGHT_END, '</mark>')
+    return Markup(html)
+
+@route('/resume')
 def resume():
-    return render_template('resume.html')
+    return pages.render_page('resume.html')
 
-@app.route('/contact', methods=['GET', 'POST'])
+@route('/contact', methods=['GET', 'POST'])
+@ratelimit.limit_writes
 def contact():
-   
     if request.method == 'POST':
-    
+        fields = [request.form.get(name, '').strip()
+                  for name in ('firstName', 'lastName', 'email', 'message')]
+        if any(fields):
+            # Only the insert happens here; inbox.py does the slow work
+            DAL.add_message(*fields)
+            inbox.wake()
         return redirect(url_for('thankyou'))
-    return render_template('contact.html')
+    return pages.render_page('contact.html')
 
-@app.route('/form', methods=['GET', 'POST'])
+@route('/form', methods=['GET', 'POST'])
+@ratelimit.limit_writes
 def form():
     if request.method == 'POST':
-        title = request.form.get('title', '').strip()
-        description = request.form.get('description', '').strip()
-        image_file_name = request.form.get('image_file_name', '').strip()
+        title, description, image_file_name = _project_fields(request.form)
         
         # Validate non-empty fields
         if title and description and image_file_name:
-            DAL.add_project(title, description, image_file_name)
+            if _unknown_image(image_file_name):
+                return render_template('form.html', values=request.form,
+                                       image_error=image_file_name), 400
+            wait_for(DAL.add_project(title, description, image_file_name))
+            images.image_set(image_file_name)  # build thumbnails before the next page view
             return redirect(url_for('projects'))
     
     return render_template('form.html')
 
-@app.route('/delete_project/<int:project_id>', methods=['POST'])
+@route('/delete_project/<int:project_id>', methods=['POST'])
+@ratelimit.limit_writes
 def delete_project(project_id):
-    DAL.delete_project(project_id)
+    wait_for(DAL.delete_project(project_id))
     return redirect(url_for('projects'))
 
-@app.route('/thankyou')
+@route('/thankyou')
 def thankyou():
-    return render_template('thankyou.html')
+    return pages.render_page('thankyou.html')
+
+# CLI: flask --app app projects import|export <file>
+projects_cli = AppGroup('projects', help='Bulk import and export projects.')
+
+def _file_format(filename, fmt):
+    """Return fmt, or guess it from the file extension."""
+    if fmt:
+        return fmt
+    return 'jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+@projects_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=DAL.BULK_CHUNK_SIZE, show_default=True, help='Rows per transaction.')
+def import_command(file, fmt, chunk_size):
+    """Load projects from a CSV or JSON-lines FILE ('-' for stdin)."""
+    rows = DAL.read_projects(file, _file_format(file.name, fmt))
+    count = DAL.add_projects_bulk(rows, chunk_size)
+    click.echo(f'Imported {count} projects.', err=True)
+
+@projects_cli.command('export')
+@click.argument('file', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+def export_command(file, fmt):
+    """Write all projects to a CSV or JSON-lines FILE ('-' for stdout)."""
+    count = DAL.export_projects(file, _file_format(file.name, fmt))
+    click.echo(f'Exported {count} projects.', err=True)
+
+images_cli = AppGroup('images', help='Manage project image derivatives.')
+
+@images_cli.command('backfill')
+def backfill_command():
+    """Generate thumbnails and WebP/AVIF variants for every project image."""
+    if not images.pillow_available():
+        raise click.ClickException('Pillow is not installed.')
+    names = {p['image_file_name'] for p in DAL.iter_projects()}
+    built = sum(images.image_set(name) is not None for name in sorted(names))
+    click.echo(f'Derivatives ready for {built} of {len(names)} images.', err=True)
+
+inbox_cli = AppGroup('inbox', help='Process queued contact messages.')
+
+@inbox_cli.command('process')
+def process_command():
+    """Process every message job that is due, then exit."""
+    count = inbox.process_pending()
+    click.echo(f'Processed {count} messages; queue: {DAL.job_counts()}.', err=True)
+
+@inbox_cli.command('work')
+@click.option('--interval', default=inbox.POLL_INTERVAL, show_default=True,
+              help='Seconds between polls of an empty queue.')
+def work_command(interval):
+    """Run a message worker in the foreground until interrupted."""
+    try:
+        while True:
+            if not inbox.process_pending():
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; use serve.py in production
+    create_app({'INBOX_WORKER': True}).run(host='0.0.0.0', port=5000, debug=True)
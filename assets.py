@@ -0,0 +1,354 @@
+"""Content-hashed URLs and long-lived caching for css/ and static/ files.
+
+At startup every asset is hashed into a manifest. ``url_for('static', ...)``
+and ``url_for('css_file', ...)`` then produce names like
+``styles.1a2b3c4d5e6f.css``, which are served with a one-year immutable
+Cache-Control, a strong ETag and, for text assets, gzip/brotli bodies
+compressed once, on first request, so startup only pays for hashing.
+Unhashed URLs keep working with default headers.
+
+Uncompressed bodies (images, PDFs, text for clients without gzip) come from
+an LRU cache of open files, re-stat'ed on every use. Whole files go to the
+server's ``wsgi.file_wrapper``, which gunicorn turns into ``os.sendfile``;
+byte ranges (206, with If-Range) are read with ``os.pread``. Setting
+STATIC_FILE_CACHE to False serves them with Flask's send_file instead.
+"""
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+from flask import Response, current_app, request, send_file, send_from_directory
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without Brotli
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Endpoint -> directory it serves
+ASSET_DIRS = {
+    'css_file': os.path.join(BASE_DIR, 'css'),
+    'static': os.path.join(BASE_DIR, 'static'),
+}
+
+# Subdirectories whose file names are content hashes already (see images.py)
+HASHED_PREFIXES = ('derived/',)
+
+# Extensions worth compressing; images and PDFs are compressed already
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.xml')
+
+MAX_AGE = 31536000  # one year
+
+# Open files kept for reuse, and bytes per read when a server has no sendfile
+FILE_CACHE_SIZE = 64
+CHUNK_SIZE = 256 * 1024
+
+_manifest = {}  # (endpoint, filename) -> hashed filename
+_manifest_digest = ''  # changes whenever any fingerprint does
+_assets = {}    # (endpoint, hashed filename) -> Asset
+
+
+class Asset:
+    """One fingerprinted file and its precompressed bodies."""
+
+    def __init__(self, path, digest, stamp):
+        self.path = path
+        self.digest = digest
+        self.stamp = stamp  # _stamp() of the file when it was hashed
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    @cached_property
+    def encoded(self):
+        """content-coding -> compressed bytes; empty for binary types."""
+        if not self.path.endswith(COMPRESSIBLE):
+            return {}
+        with open(self.path, 'rb') as f:
+            return compress(f.read())
+
+
+def compress(data):
+    """Return {content-coding: body} for each coding available, at maximum effort."""
+    encoded = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(data, quality=11)
+    return encoded
+
+def negotiate(encoded):
+    """Return the best coding in encoded that the current request accepts, or None."""
+    return next((c for c in ('br', 'gzip')
+                 if c in encoded and request.accept_encodings[c]), None)
+
+def _hashed_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+def build_manifest():
+    """Hash every file under ASSET_DIRS."""
+    manifest, assets = {}, {}
+    for endpoint, directory in ASSET_DIRS.items():
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, directory).replace(os.sep, '/')
+                if filename.startswith(HASHED_PREFIXES):
+                    continue
+                stamp = _stamp(os.stat(path))
+                asset = Asset(path, _digest(path), stamp)
+                hashed = _hashed_name(filename, asset.digest)
+                manifest[(endpoint, filename)] = hashed
+                assets[(endpoint, hashed)] = asset
+
+    global _manifest_digest
+    _manifest.clear()
+    _manifest.update(manifest)
+    _manifest_digest = hashlib.sha256(repr(sorted(manifest.items())).encode()).hexdigest()[:12]
+    _assets.clear()
+    _assets.update(assets)
+
+def _stamp(st):
+    """Identity of a file version: (inode, mtime_ns, size) from a stat result."""
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+class OpenFile:
+    """A cached open file.
+
+    The descriptor is shared by every response serving the file, so nothing
+    moves its offset: reads use os.pread and sendfile is given explicit
+    offsets. It is closed once evicted and no response holds it any more.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb', buffering=0)
+        st = os.fstat(self.file.fileno())
+        self.size, self.mtime, self.stamp = st.st_size, st.st_mtime, _stamp(st)
+
+
+class FileRange(io.RawIOBase):
+    """File-like window [start, end) of an OpenFile, for wsgi.file_wrapper.
+
+    Only a whole-file window reports a fileno(): gunicorn sendfiles from
+    the descriptor's current offset, which stays 0, so a partial window is
+    read with pread instead. A file truncated mid-response ends the body
+    early rather than faulting.
+    """
+
+    def __init__(self, opened, start, end):
+        self.opened = opened
+        self.start = self.pos = start
+        self.end = end
+
+    def fileno(self):
+        if self.start or self.end != self.opened.size:
+            raise io.UnsupportedOperation('partial range')
+        return self.opened.file.fileno()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        end = self.end if size is None or size < 0 else min(self.end, self.pos + size)
+        if end <= self.pos:
+            return b''
+        data = os.pread(self.opened.file.fileno(), end - self.pos, self.pos)
+        self.pos = self.pos + len(data) if data else self.end
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Moves this window only; socket.sendfile seeks here when it is done
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.opened.size}[whence]
+        self.pos = min(max(base + offset, self.start), self.end)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        self.opened = None  # drop our reference; eviction closes the file
+        super().close()
+
+
+class FileCache:
+    """LRU cache of OpenFiles keyed by path.
+
+    Every use re-stats the path, and a file whose inode, mtime or size
+    changed is reopened, so an edited file is never served from a stale
+    descriptor.
+    """
+
+    def __init__(self, maxsize=FILE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """Return the OpenFile for path; raise OSError if it cannot be opened."""
+        stamp = _stamp(os.stat(path))
+        with self._lock:
+            opened = self._files.get(path)
+            if opened is not None and opened.stamp == stamp:
+                self._files.move_to_end(path)
+                self.hits += 1
+                return opened
+
+        self.misses += 1
+        opened = OpenFile(path)
+        with self._lock:
+            self._files[path] = opened
+            self._files.move_to_end(path)
+            while len(self._files) > self.maxsize:
+                self._files.popitem(last=False)  # closed when its last response finishes
+        return opened
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self.hits = self.misses = 0
+
+file_cache = FileCache()
+
+
+def _byte_range(size, etag, last_modified):
+    """Return the (start, end) the request asks for, or None for the whole file.
+
+    Multiple ranges, and ranges whose If-Range no longer matches, get the
+    whole file; a single range outside the file raises a 416.
+    """
+    ranges = request.range
+    if ranges is None or len(ranges.ranges) != 1:
+        return None
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and (last_modified is None or if_range.date < last_modified):
+        return None
+    span = ranges.range_for_length(size)
+    if span is None:
+        raise RequestedRangeNotSatisfiable(length=size)
+    return span
+
+def send_static(path, mimetype, etag=None, immutable=False):
+    """Serve the file at path from file_cache, honouring Range and If-Range.
+
+    etag defaults to one built from the file's inode, mtime and size.
+    """
+    try:
+        opened = file_cache.open(path)
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        raise NotFound()
+    if etag is None:
+        etag = '{:x}-{:x}-{:x}'.format(*opened.stamp)
+
+    response = Response(mimetype=mimetype, direct_passthrough=True)
+    response.set_etag(etag)
+    response.last_modified = int(opened.mtime)
+    response.accept_ranges = 'bytes'
+    if not immutable:
+        response.cache_control.no_cache = True
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    start, end = _byte_range(opened.size, etag, response.last_modified) or (0, opened.size)
+    if (start, end) != (0, opened.size):
+        response.status_code = 206
+        response.content_range = f'bytes {start}-{end - 1}/{opened.size}'
+    response.content_length = end - start
+    response.response = wrap_file(request.environ, FileRange(opened, start, end), CHUNK_SIZE)
+    return response
+
+def _send_path(path, mimetype, etag=None, immutable=False):
+    """Serve path with send_static, or Flask's send_file if STATIC_FILE_CACHE is off."""
+    if current_app.config['STATIC_FILE_CACHE']:
+        return send_static(path, mimetype, etag, immutable)
+    return send_file(path, mimetype=mimetype, etag=etag if etag is not None else True)
+
+def manifest_digest():
+    """Return a digest of every asset fingerprint, for ETags of pages linking them."""
+    return _manifest_digest
+
+def url_defaults(endpoint, values):
+    """Swap asset filenames for their hashed names when building URLs."""
+    if endpoint in ASSET_DIRS and 'filename' in values:
+        hashed = _manifest.get((endpoint, values['filename']))
+        if hashed is not None:
+            values['filename'] = hashed
+
+def _changed(asset):
+    """Return True if asset's file is not the version that was hashed."""
+    try:
+        return _stamp(os.stat(asset.path)) != asset.stamp
+    except OSError:
+        return True
+
+def _immutable(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def send_asset(endpoint, filename):
+    """Serve filename for endpoint, with immutable caching if it is fingerprinted."""
+    directory = ASSET_DIRS[endpoint]
+    asset = _assets.get((endpoint, filename))
+
+    if asset is not None and _changed(asset):
+        # Edited since build_manifest: the hashed name no longer describes
+        # these bytes, so serve them revalidated, not immutable, until a
+        # restart rehashes them
+        return _send_path(asset.path, asset.mimetype)
+
+    if asset is None:
+        path = safe_join(directory, filename)
+        if path is None:
+            raise NotFound()
+        # Judge the normalized name: derived/../images/x.png is not hashed
+        hashed = os.path.relpath(path, directory).replace(os.sep, '/').startswith(HASHED_PREFIXES)
+        if not current_app.config['STATIC_FILE_CACHE']:
+            response = send_from_directory(directory, filename)
+            return _immutable(response) if hashed else response
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = send_static(path, mimetype, immutable=hashed)
+        return _immutable(response) if hashed else response
+
+    if asset.encoded:
+        coding = negotiate(asset.encoded)
+        if coding is not None:
+            response = Response(asset.encoded[coding], mimetype=asset.mimetype)
+            response.content_encoding = coding
+            response.set_etag(f'{asset.digest}-{coding}')
+            response.make_conditional(request)
+        else:
+            response = _send_path(asset.path, asset.mimetype, asset.digest, immutable=True)
+        response.vary.add('Accept-Encoding')
+    else:
+        response = _send_path(asset.path, asset.mimetype, asset.digest, immutable=True)
+
+    return _immutable(response)
+
+def init_app(app):
+    """Build the manifest and route css/static URLs through it."""
+    build_manifest()
+    app.url_defaults(url_defaults)
+    app.view_functions['static'] = lambda filename: send_asset('static', filename)
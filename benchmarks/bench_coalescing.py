@@ -0,0 +1,116 @@
+"""Measure single-flight coalescing of cold /projects bursts and limiter cost.
+
+Each round empties the page and DAL caches, then releases --concurrency
+threads at once against the same /projects page, with and without
+coalescing. It also times one token-bucket take for the in-memory and the
+shared SQLite limiter. Keep --concurrency at or below DAL.POOL_SIZE: threads
+beyond it open new connections, and a connection's first data_version()
+check changes the cache key, splitting the burst across keys.
+
+Usage:
+    python benchmarks/bench_coalescing.py [--rows N] [--concurrency N] [--rounds N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+import app as app_module  # noqa: E402
+import ratelimit  # noqa: E402
+
+
+class NoFlight:
+    """Stand-in for DAL.SingleFlight that lets every caller run."""
+
+    shared = 0
+
+    def do(self, key, func, *args):
+        return func(*args)
+
+
+def burst(application, concurrency, rounds):
+    """Return (seconds per burst, renders per burst) for cold /projects bursts."""
+    renders = []
+    original = app_module._render_projects
+
+    def counting(*args):
+        renders.append(1)
+        return original(*args)
+
+    app_module._render_projects = counting
+    try:
+        total = 0.0
+        for _ in range(rounds):
+            app_module.page_cache.clear()
+            DAL.project_cache.clear()
+            barrier = threading.Barrier(concurrency + 1)
+
+            def worker():
+                client = application.test_client()
+                barrier.wait()
+                assert client.get('/projects?limit=100').status_code == 200
+                DAL.release_connection()
+
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for t in threads:
+                t.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for t in threads:
+                t.join()
+            total += time.perf_counter() - start
+    finally:
+        app_module._render_projects = original
+    return total / rounds, len(renders) / rounds
+
+def take_cost(buckets, n=20000):
+    start = time.perf_counter()
+    for i in range(n):
+        buckets.take(f'client-{i % 100}')
+    return (time.perf_counter() - start) / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=DAL.POOL_SIZE)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    limits_file = db_file + '.limits.db'
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    try:
+        DAL.add_projects_bulk(
+            (f'Project {i}', f'Description of project {i}', 'project.jpg') for i in range(args.rows))
+        application = app_module.create_app({'TESTING': True})
+
+        print(f'rows={args.rows} concurrency={args.concurrency} rounds={args.rounds}')
+        print(f'{"":<14} {"ms/burst":>9} {"renders/burst":>14}')
+        flights = (app_module.page_flight, DAL.project_flight)
+        for label, page_flight, project_flight in (
+                ('no coalescing', NoFlight(), NoFlight()), ('single-flight', *flights)):
+            app_module.page_flight, DAL.project_flight = page_flight, project_flight
+            seconds, renders = burst(application, args.concurrency, args.rounds)
+            print(f'{label:<14} {seconds * 1000:9.1f} {renders:14.1f}')
+        app_module.page_flight, DAL.project_flight = flights
+
+        print(f'\ntoken bucket take: memory {take_cost(ratelimit.MemoryBuckets(1e6, 1e6)) * 1e6:.1f} µs, '
+              f'sqlite {take_cost(ratelimit.SQLiteBuckets(limits_file, 1e6, 1e6)) * 1e6:.1f} µs')
+    finally:
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        for path in (db_file, limits_file):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Bytes on the wire and CPU per request for /projects with each encoding.
+
+Usage:
+    python benchmarks/bench_compression.py [--rows 10 50 100] [--requests N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+import compression  # noqa: E402
+from app import create_app  # noqa: E402
+
+ENCODINGS = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+
+
+def cpu_per_request(client, url, headers, n_requests, clear_cache):
+    """Return mean CPU microseconds per request, optionally with a cold compression cache."""
+    start = time.process_time()
+    for _ in range(n_requests):
+        if clear_cache:
+            compression.cache.clear()
+        client.get(url, headers=headers)
+    return (time.process_time() - start) / n_requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    try:
+        DAL.init_db()
+        DAL.add_projects_bulk(
+            (f'Project {i}', f'Description of project {i}. ' * 5, 'project.jpg')
+            for i in range(max(args.rows)))
+
+        app = create_app({'TESTING': True})
+        client = app.test_client()
+
+        print(f'{"rows":>5} {"encoding":>9} {"bytes":>9} {"cold µs":>9} {"cached µs":>10}')
+        for rows in args.rows:
+            url = f'/projects?limit={rows}'
+            for coding in ENCODINGS:
+                headers = {'Accept-Encoding': coding}
+                size = len(client.get(url, headers=headers).data)
+                cold = cpu_per_request(client, url, headers, args.requests, True)
+                warm = cpu_per_request(client, url, headers, args.requests, False)
+                print(f'{rows:>5} {coding:>9} {size:>9} {cold:>9.0f} {warm:>10.0f}')
+    finally:
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        os.unlink(db_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare /projects requests/sec with pooled vs connect-per-call DAL access.
+
+Connect-per-call swaps DAL's connection source (get_connection and
+get_read_connection) for a fresh, unconfigured connection on every call,
+closed when the request ends, as the original DAL did. The rendered-page
+cache is emptied before every request in both modes, so each one queries.
+
+Usage:
+    python benchmarks/bench_connection_pool.py [--rows N] [--requests N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+import app as app_module  # noqa: E402
+
+_opened = []  # connections opened by legacy_connection in this request
+
+
+def legacy_connection():
+    """The original DAL's connection: opened per call, with no pragmas."""
+    conn = sqlite3.connect(DAL.DB_FILE, check_same_thread=False, factory=DAL._Connection)
+    conn.row_factory = sqlite3.Row
+    _opened.append(conn)
+    return conn
+
+def close_legacy(exc=None):
+    """App-context teardown closing every connection legacy_connection opened."""
+    while _opened:
+        _opened.pop().close()
+
+def run(client, n_requests):
+    """Issue n_requests cold GETs against /projects and return requests/sec."""
+    client.get('/projects')  # warm up templates and connections
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        app_module.page_cache.clear()
+        response = client.get('/projects')
+        assert response.status_code == 200
+    return n_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    try:
+        DAL.init_db()
+        for i in range(args.rows):
+            DAL.add_project(f'Project {i}', f'Description {i}', 'project.jpg')
+
+        app = app_module.create_app({'TESTING': True})
+        app.teardown_appcontext(close_legacy)
+        client = app.test_client()
+
+        pooled = run(client, args.requests)
+
+        pooled_sources = DAL.get_connection, DAL.get_read_connection
+        DAL.get_connection = DAL.get_read_connection = legacy_connection
+        try:
+            legacy = run(client, args.requests)
+        finally:
+            DAL.get_connection, DAL.get_read_connection = pooled_sources
+
+        print(f'rows={args.rows} requests={args.requests}')
+        print(f'connect-per-call: {legacy:10.1f} req/s')
+        print(f'pooled:           {pooled:10.1f} req/s  ({pooled / legacy:.2f}x)')
+    finally:
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        os.unlink(db_file)
+
+
+if __name__ == '__main__':
+    main()
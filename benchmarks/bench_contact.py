@@ -0,0 +1,70 @@
+"""Measure POST /contact latency while a slow notifier drains the queue.
+
+The worker thread notifies with an artificial delay, standing in for a
+mail server, so the table shows that request latency does not depend on it
+and how far the queue falls behind.
+
+Usage:
+    python benchmarks/bench_contact.py [--requests N] [--notify-ms MS]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+import inbox  # noqa: E402
+from app import create_app  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--notify-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    try:
+        # Every POST comes from one client, so the write limiter would answer
+        # 429 after WRITE_BURST of them; WRITE_RATE 0 turns it off
+        client = create_app({'TESTING': True, 'WRITE_RATE': 0}).test_client()
+        inbox.start_worker(notify=lambda message: time.sleep(args.notify_ms / 1000), interval=0.1)
+
+        latencies = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            response = client.post('/contact', data={
+                'firstName': 'Bench', 'lastName': str(i), 'email': f'bench{i}@example.com',
+                'message': f'Message number {i} about a possible collaboration.',
+            })
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 302
+        backlog = DAL.job_counts()['queued']
+
+        drain_start = time.perf_counter()
+        while DAL.job_counts()['queued']:
+            time.sleep(0.05)
+        drained = time.perf_counter() - drain_start
+
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f'requests={args.requests} notify={args.notify_ms:.0f} ms')
+        print(f'POST /contact p50 {statistics.median(latencies) * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms')
+        print(f'queued after the last POST: {backlog}, drained {drained:.1f} s later')
+    finally:
+        inbox.stop_worker()
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare full-row listing reads with the projected ProjectSummary path.
+
+Reads every row both ways and reports the time and the peak Python memory
+(tracemalloc) needed to materialize them.
+
+Usage:
+    python benchmarks/bench_projection.py [--rows N] [--description-length N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+
+
+def measure(summary, repeat):
+    """Return (best seconds, peak bytes) to fetch every row."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        DAL._projects_cursor(summary=summary).fetchall()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    rows = DAL._projects_cursor(summary=summary).fetchall()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del rows
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--description-length', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    try:
+        DAL.init_db()
+        description = ('Lorem ipsum dolor sit amet. ' * (args.description_length // 28 + 1))
+        DAL.add_projects_bulk(
+            (f'Project {i}', description[:args.description_length], 'project.jpg')
+            for i in range(args.rows))
+
+        full_time, full_peak = measure(False, args.repeat)
+        summary_time, summary_peak = measure(True, args.repeat)
+
+        print(f'rows={args.rows} description={args.description_length} chars')
+        print(f'{"":<18} {"seconds":>9} {"peak MiB":>10}')
+        print(f'{"SELECT * / Row":<18} {full_time:9.3f} {full_peak / 2**20:10.1f}')
+        print(f'{"ProjectSummary":<18} {summary_time:9.3f} {summary_peak / 2**20:10.1f}'
+              f'  ({full_time / summary_time:.1f}x faster, {full_peak / summary_peak:.1f}x less memory)')
+    finally:
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+
+if __name__ == '__main__':
+    main()
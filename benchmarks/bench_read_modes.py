@@ -0,0 +1,91 @@
+"""Compare listing reads/sec and write latency across DAL read modes.
+
+Reader threads page through the listing with the cache disabled while one
+writer thread keeps inserting, so reads and writes compete the way they do
+when /projects and /form are busy at once.
+
+Usage:
+    python benchmarks/bench_read_modes.py [--rows N] [--readers N] [--seconds S]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import DAL  # noqa: E402
+
+
+def run(mode, readers, seconds, interval):
+    DAL.set_read_mode(mode, interval=interval)
+    stop = time.monotonic() + seconds
+    reads = [0] * readers
+    write_latencies = []
+
+    def reader(slot):
+        while time.monotonic() < stop:
+            DAL._projects_cursor(limit=DAL.MAX_PAGE_SIZE, summary=True).fetchall()
+            DAL.search_projects('project 42')
+            reads[slot] += 1
+        DAL.release_connection()
+
+    def writer():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            DAL.add_project('Bench', 'Inserted while reading', 'b.jpg')
+            write_latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+        DAL.release_connection()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    lag = DAL.replica_status().get('lag')
+    DAL.set_read_mode('primary')
+    p99 = statistics.quantiles(write_latencies, n=100)[98] if len(write_latencies) > 1 else 0.0
+    return sum(reads) / seconds, statistics.median(write_latencies), p99, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    original_db_file = DAL.DB_FILE
+    DAL.DB_FILE = db_file
+    replica_file = os.path.splitext(db_file)[0] + '.replica.db'
+    try:
+        DAL.init_db()
+        DAL.add_projects_bulk(
+            (f'Project {i}', f'Description of project {i}', 'project.jpg') for i in range(args.rows))
+
+        print(f'rows={args.rows} readers={args.readers} seconds={args.seconds}')
+        print(f'{"mode":<10} {"reads/s":>10} {"write p50 ms":>13} {"write p99 ms":>13} {"lag s":>7}')
+        for mode in DAL.READ_MODES:
+            rps, p50, p99, lag = run(mode, args.readers, args.seconds, args.interval)
+            lag = '-' if lag is None else f'{lag:.2f}'
+            print(f'{mode:<10} {rps:10.1f} {p50 * 1000:13.2f} {p99 * 1000:13.2f} {lag:>7}')
+    finally:
+        DAL.close_all()
+        DAL.DB_FILE = original_db_file
+        for path in (db_file, replica_file):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Measure import and startup time in fresh interpreters against a budget.
+
+Each run starts a new Python process, so nothing is cached in memory: it
+times ``import app``, ``create_app()`` and the first request, and reports
+the slowest imports from ``python -X importtime``. Exits 1 when the median
+time to first response is over --budget-ms, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child; prints one JSON line of phase timings in seconds
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'TESTING': True, 'DATABASE': sys.argv[1]})
+created = time.perf_counter()
+response = application.test_client().get('/')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - start}))
+'''
+
+
+def probe(db_file, prerender):
+    env = dict(os.environ, FLASK_PRERENDER_PAGES='true' if prerender else 'false')
+    out = subprocess.run([sys.executable, '-c', PROBE, db_file], cwd=ROOT, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+def import_profile():
+    """Return [(cumulative µs, self µs, module)] for ``import app``, slowest first."""
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(rows, reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=300)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--prerender', action='store_true',
+                        help='also render STATIC_PAGES in create_app, as serve.py does')
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        runs = [probe(db_file, args.prerender) for _ in range(args.runs)]
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+    print(f'runs={args.runs} prerender={args.prerender} (median ms)')
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        print(f'{phase:<14} {statistics.median(r[phase] for r in runs) * 1000:9.1f}')
+
+    if args.top:
+        print(f'\nslowest imports (-X importtime, top {args.top})')
+        print(f'{"cumulative ms":>14} {"self ms":>8}  module')
+        for cumulative_us, self_us, module in import_profile()[:args.top]:
+            print(f'{cumulative_us / 1000:14.1f} {self_us / 1000:8.1f}  {module}')
+
+    total_ms = statistics.median(r['total'] for r in runs) * 1000
+    if total_ms > args.budget_ms:
+        print(f'\nover budget: {total_ms:.1f} ms > {args.budget_ms:.0f} ms')
+        sys.exit(1)
+    print(f'\nwithin budget: {total_ms:.1f} ms <= {args.budget_ms:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Compare static file throughput and server CPU per MB for both handlers.
+
+Runs serve.py (gunicorn) with STATIC_FILE_CACHE on (open-file cache,
+sendfile, pread ranges) and off (Flask's send_file), drives the fingerprinted
+URL of each file with keep-alive clients, and reads the server processes'
+CPU time from /proc. Linux only.
+
+Usage:
+    python benchmarks/bench_static.py [--clients N] [--seconds S] [--range-bytes N]
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import DAL  # noqa: E402
+import assets  # noqa: E402
+from bench_workers import free_port, wait_until_up  # noqa: E402
+
+FILES = ('assets/Krishna_Shah_Resume.pdf', 'images/IoT.png')
+
+
+def cpu_seconds(pid):
+    """Return user+system CPU seconds of pid and its children (the workers)."""
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(entry) == pid or int(fields[1]) == pid:
+            total += int(fields[11]) + int(fields[12])
+    return total / ticks
+
+def drive(port, path, size, clients, seconds, range_bytes):
+    """Fetch path (or random ranges of it) for seconds; return (requests, bytes)."""
+    requests, received = [0] * clients, [0] * clients
+    stop = time.monotonic() + seconds
+
+    def client(i):
+        rng = random.Random(i)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < stop:
+            headers = {}
+            if range_bytes:
+                start = rng.randrange(max(1, size - range_bytes))
+                headers['Range'] = f'bytes={start}-{start + range_bytes - 1}'
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            assert response.status == (206 if range_bytes else 200), response.status
+            requests[i] += 1
+            received[i] += len(body)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(requests), sum(received)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--range-bytes', type=int, default=65536,
+                        help='also fetch random ranges this long (0 to skip)')
+    args = parser.parse_args()
+
+    assets.build_manifest()
+    targets = [(name, '/static/' + assets._manifest[('static', name)],
+                os.path.getsize(os.path.join(assets.ASSET_DIRS['static'], name))) for name in FILES]
+    modes = [('whole', 0)] + ([('range', args.range_bytes)] if args.range_bytes else [])
+
+    # The servers get a scratch database so projects.db is never opened
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    DAL.DB_FILE = db_file
+    DAL.init_db()
+    DAL.close_all()
+
+    try:
+        print(f'clients={args.clients} threads={args.threads} seconds={args.seconds}')
+        print(f'{"handler":<10} {"file":<28} {"request":<7} {"req/s":>8} {"MB/s":>8} {"CPU ms/MB":>10}')
+        for label, enabled in (('send_file', 'false'), ('cache', 'true')):
+            port = free_port()
+            env = dict(os.environ, HOST='127.0.0.1', PORT=str(port), WEB_CONCURRENCY='1',
+                       THREADS=str(args.threads), FLASK_STATIC_FILE_CACHE=enabled,
+                       FLASK_DATABASE=db_file)
+            server = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(port)
+                for name, path, size in targets:
+                    for mode, range_bytes in modes:
+                        drive(port, path, size, args.clients, 0.5, range_bytes)  # warm up
+                        cpu = cpu_seconds(server.pid)
+                        count, received = drive(port, path, size, args.clients, args.seconds, range_bytes)
+                        cpu = cpu_seconds(server.pid) - cpu
+                        mb = received / 2**20
+                        print(f'{label:<10} {name:<28} {mode:<7} {count / args.seconds:8.0f} '
+                              f'{mb / args.seconds:8.1f} {cpu * 1000 / mb:10.2f}')
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+
+if __name__ == '__main__':
+    main()
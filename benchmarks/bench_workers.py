@@ -0,0 +1,106 @@
+"""Throughput of serve.py on /projects as the worker count grows.
+
+Starts the production server once per worker count against a scratch
+database, drives it with concurrent keep-alive clients, and prints
+requests/sec.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--clients 16] [--seconds 5]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import DAL  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+def drive(port, path, clients, seconds):
+    """Hammer path from `clients` threads for `seconds`; return requests/sec."""
+    counts = [0] * clients
+    stop = time.monotonic() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < stop:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.will_close:
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            counts[i] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--path', default='/projects')
+    args = parser.parse_args()
+
+    fd, db_file = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    DAL.DB_FILE = db_file
+    DAL.init_db()
+    DAL.add_projects_bulk((f'Project {i}', f'Description {i}', 'project.jpg') for i in range(args.rows))
+    DAL.close_all()
+
+    try:
+        print(f'{"workers":>7} {"threads":>7} {"req/s":>9}  (cpu count {os.cpu_count()})')
+        for workers in args.workers:
+            port = free_port()
+            env = dict(os.environ, HOST='127.0.0.1', PORT=str(port), WEB_CONCURRENCY=str(workers),
+                       THREADS=str(args.threads), PRELOAD_APP='1', FLASK_DATABASE=db_file)
+            server = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_up(port)
+                drive(port, args.path, args.clients, 1)  # warm up every worker
+                rate = drive(port, args.path, args.clients, args.seconds)
+                print(f'{workers:>7} {args.threads:>7} {rate:>9.1f}')
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+
+if __name__ == '__main__':
+    main()
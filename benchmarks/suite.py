@@ -0,0 +1,194 @@
+"""Benchmark suite for the DAL and the Flask app at several table sizes.
+
+For each size it seeds a scratch database, then measures:
+
+- every DAL read and write (median microseconds per call, cache cleared),
+- /projects render latency through the WSGI test client, cold and cached,
+- end-to-end throughput through the test client and a real local server.
+
+Results go to a JSON file. Pass ``--baseline`` to compare against an earlier
+run: the script exits 1 if any latency grew, or any throughput fell, by more
+than ``--threshold`` (a fraction, default 0.25).
+
+Usage:
+    python benchmarks/suite.py [--sizes 10 10000 1000000] [--output bench.json]
+                               [--baseline old.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+import DAL  # noqa: E402
+import app as app_module  # noqa: E402
+from bench_workers import drive  # noqa: E402
+
+# Metrics where a larger number is better; everything else is a latency
+HIGHER_IS_BETTER = ('_rps',)
+
+
+def median_us(func, repeat, setup=None):
+    """Return the median wall time of func() in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return round(statistics.median(samples), 1)
+
+def seed(rows):
+    DAL.init_db()
+    DAL.add_projects_bulk(
+        (f'Project {i}', f'Description of project {i} built with Flask and SQLite.', 'project.jpg')
+        for i in range(rows))
+
+def bench_dal(rows, repeat):
+    cold = DAL.project_cache.clear
+    newest = DAL.get_projects(limit=1)[0]['id']
+    middle = newest - rows // 2
+    results = {
+        'dal.get_projects_page_us': median_us(lambda: DAL.get_projects_page(), repeat, cold),
+        'dal.get_projects_deep_page_us': median_us(
+            lambda: DAL.get_projects_page(after_id=middle), repeat, cold),
+        'dal.get_projects_title_page_us': median_us(
+            lambda: DAL.get_projects_page(after_id=middle, sort='title'), repeat, cold),
+        'dal.get_projects_prefix_page_us': median_us(
+            lambda: DAL.get_projects_page(sort='title', prefix='Project 4'), repeat, cold),
+        'dal.get_projects_cached_us': median_us(lambda: DAL.get_projects(limit=20), repeat),
+        'dal.search_projects_us': median_us(lambda: DAL.search_projects('project 42'), repeat),
+        'dal.data_version_us': median_us(DAL.data_version, repeat),
+    }
+
+    ids = iter(range(newest, 0, -1))
+    results['dal.add_project_us'] = median_us(
+        lambda: DAL.add_project('Bench', 'Inserted by the benchmark', 'b.jpg'), repeat)
+    results['dal.update_project_us'] = median_us(
+        lambda: DAL.update_project(newest, 'Bench', 'Updated by the benchmark', 'b.jpg'), repeat)
+    results['dal.delete_project_us'] = median_us(lambda: DAL.delete_project(next(ids)), repeat)
+
+    if rows <= 10000:
+        # Full-table operations; skipped where they would dominate the run
+        results['dal.get_projects_all_us'] = median_us(lambda: DAL.get_projects(), repeat, cold)
+        with open(os.devnull, 'w') as devnull:
+            results['dal.export_projects_us'] = median_us(lambda: DAL.export_projects(devnull), 3)
+    return results
+
+def bench_http(client, repeat, seconds):
+    cold = lambda: (DAL.project_cache.clear(), app_module.page_cache.clear())  # noqa: E731
+    results = {
+        'http.projects_render_us': median_us(lambda: client.get('/projects'), repeat, cold),
+        'http.projects_cached_us': median_us(lambda: client.get('/projects'), repeat),
+        'http.home_us': median_us(lambda: client.get('/'), repeat),
+    }
+
+    count, stop = 0, time.monotonic() + seconds
+    while time.monotonic() < stop:
+        client.get('/projects')
+        count += 1
+    results['http.test_client_rps'] = round(count / seconds, 1)
+    return results
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+def bench_server(app, seconds, clients):
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return {'server.projects_rps': round(drive(server.server_port, '/projects', clients, seconds), 1)}
+    finally:
+        server.shutdown()
+
+def compare(baseline, current, threshold):
+    """Return (metric, old, new, change) for every regression beyond threshold."""
+    regressions = []
+    for size, metrics in current['results'].items():
+        for name, new in metrics.items():
+            old = baseline.get('results', {}).get(size, {}).get(name)
+            if not old:
+                continue
+            change = (new - old) / old
+            if name.endswith(HIGHER_IS_BETTER):
+                change = -change
+            if change > threshold:
+                regressions.append((f'{size}/{name}', old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 10000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': {},
+    }
+
+    app = app_module.create_app({'TESTING': True})
+    client = app.test_client()
+    original_db_file = DAL.DB_FILE
+    for rows in args.sizes:
+        fd, db_file = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        DAL.DB_FILE = db_file
+        try:
+            start = time.perf_counter()
+            seed(rows)
+            print(f'{rows} rows seeded in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+            results = bench_dal(rows, args.repeat)
+            results.update(bench_http(client, args.repeat, args.seconds))
+            results.update(bench_server(app, args.seconds, args.clients))
+            report['results'][str(rows)] = results
+            for name, value in results.items():
+                print(f'{rows:>8} {name:<34} {value:>12}')
+        finally:
+            DAL.close_all()
+            DAL.DB_FILE = original_db_file
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_file + suffix):
+                    os.unlink(db_file + suffix)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for name, old, new, change in regressions:
+            print(f'REGRESSION {name}: {old} -> {new} ({change:+.0%})', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.threshold:.0%}.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""After-request gzip/brotli compression for dynamic responses.
+
+Responses that already carry a Content-Encoding (pre-rendered pages,
+fingerprinted assets) or are passed straight through from a file are left
+alone, as are small bodies and non-text types. Compressed bodies of responses
+with an ETag are cached under that ETag, so a page that has not changed is
+compressed once, not on every request. Streamed responses are gzipped on the
+fly.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+import assets
+import DAL
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without Brotli
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compression would not pay off
+MIN_SIZE = 512
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml',
+)
+
+# Effort for bodies compressed per request; cheap enough to do inline
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Compressed bodies of ETag-carrying responses: (etag, coding) -> bytes
+cache = DAL.LRUCache(maxsize=256, ttl=3600)
+
+
+def _encode(data, coding):
+    if coding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _gzip_stream(chunks):
+    """Gzip an iterable of chunks lazily, holding only zlib's window in memory."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _compressible(response):
+    return (response.status_code == 200
+            and 'Content-Encoding' not in response.headers
+            and not response.direct_passthrough
+            and response.mimetype.startswith(COMPRESSIBLE_TYPES))
+
+def compress_response(response):
+    """Compress response in place if the client accepts an encoding we offer."""
+    if not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        if request.accept_encodings['gzip']:
+            response.response = _gzip_stream(response.response)
+            response.content_encoding = 'gzip'
+            response.headers.pop('Content-Length', None)
+        return response
+
+    offered = {'gzip': True}
+    if brotli is not None:
+        offered['br'] = True
+    coding = assets.negotiate(offered)
+    if coding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag:
+        body = cache.get((etag, coding))
+        if body is None:
+            body = _encode(data, coding)
+            cache.set((etag, coding), body)
+        response.set_etag(f'{etag}-{coding}', weak)
+    else:
+        body = _encode(data, coding)
+
+    response.set_data(body)
+    response.content_encoding = coding
+    if etag:
+        # The view compared If-None-Match against the identity ETag; retry
+        # against the encoded one the client was actually given
+        response.make_conditional(request)
+    return response
+
+def init_app(app):
+    """Compress every eligible response the app returns."""
+    app.after_request(compress_response)
@@ -0,0 +1,278 @@
+"""Image catalog, resized thumbnails and WebP/AVIF variants of project images.
+
+The catalog indexes IMAGE_DIR in memory (size, dimensions, content hash,
+mtime) so requests resolve and validate image names without touching the
+filesystem; it re-lists the directory only when the directory's mtime
+changes, plus a periodic full sweep for files edited in place.
+
+Derivatives are written to DERIVED_DIR named after a hash of the original's
+contents, so an edited image gets fresh URLs and unchanged ones are never
+re-encoded. Pillow is optional: without it templates fall back to the
+original files. It is imported on first use rather than at startup.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+Image = ImageOps = features = None  # Pillow modules, set by pillow_available()
+_pillow_checked = False
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_DIR, 'static', 'images')
+DERIVED_DIR = os.path.join(BASE_DIR, 'static', 'derived')
+DERIVED_URL = '/static/derived'
+
+# Widths generated for each image; projects.html shows them 200px wide
+WIDTHS = (200, 400)
+SIZES = '200px'
+
+# Modern formats offered through <source>, best first, if Pillow can write them
+MODERN_FORMATS = (('avif', 'image/avif'), ('webp', 'image/webp'))
+
+# Seconds between checks of IMAGE_DIR's mtime, and between full sweeps that
+# also catch files overwritten in place (which leave the directory alone)
+CHECK_INTERVAL = 1.0
+SWEEP_INTERVAL = 60.0
+
+# EXIF orientations that rotate the image by 90 degrees
+_ROTATED = (5, 6, 7, 8)
+
+_index = {}  # filename -> (content hash, ImageSet or None)
+_lock = threading.Lock()
+
+_catalog = None  # Catalog of IMAGE_DIR, built on first use
+_catalog_lock = threading.Lock()
+
+
+def pillow_available():
+    """Import Pillow on first call; return whether it is installed."""
+    global Image, ImageOps, features, _pillow_checked
+    if not _pillow_checked:
+        try:
+            from PIL import Image, ImageOps, features
+        except ImportError:  # pragma: no cover - exercised only without Pillow
+            pass
+        _pillow_checked = True
+    return Image is not None
+
+
+# One catalogued original; width and height are None if Pillow is missing
+# or cannot read the file
+ImageInfo = namedtuple('ImageInfo', 'name size width height digest mtime_ns')
+
+
+class Catalog:
+    """In-memory index of the image files directly inside a directory."""
+
+    def __init__(self, directory, check_interval=CHECK_INTERVAL, sweep_interval=SWEEP_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self.sweep_interval = sweep_interval
+        self.scans = 0  # directory listings read so far
+        self.version = 0  # bumped by each listing that changed the entries
+        self._entries = {}  # name -> ImageInfo; replaced whole, never mutated
+        self._dir_mtime = None
+        self._checked_at = self._swept_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the ImageInfo for name, or None if no such image exists."""
+        self.refresh()
+        return self._entries.get(name)
+
+    def names(self):
+        """Return every catalogued file name, sorted."""
+        self.refresh()
+        return sorted(self._entries)
+
+    def refresh(self, force=False):
+        """Re-list the directory if it changed; return whether it was re-listed.
+
+        Costs nothing between checks, one stat per check_interval, and a
+        stat per file on a re-list. Only new or changed files are re-read.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            try:
+                dir_mtime = os.stat(self.directory).st_mtime_ns
+            except OSError:
+                dir_mtime = None
+            if (not force and dir_mtime == self._dir_mtime
+                    and now - self._swept_at < self.sweep_interval):
+                return False
+            entries = self._scan()
+            if entries != self._entries:
+                self._entries = entries
+                self.version += 1
+            self._dir_mtime, self._swept_at = dir_mtime, now
+            self.scans += 1
+            return True
+
+    def _scan(self):
+        previous, entries = self._entries, {}
+        try:
+            listing = os.scandir(self.directory)
+        except OSError:
+            return entries
+        with listing:
+            for entry in listing:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                    info = previous.get(entry.name)
+                    if info is None or (info.mtime_ns, info.size) != (st.st_mtime_ns, st.st_size):
+                        info = _inspect(entry.name, entry.path, st)
+                except OSError:
+                    continue  # removed while listing
+                entries[entry.name] = info
+        return entries
+
+
+def _inspect(name, path, st):
+    """Return the ImageInfo for one file; dimensions come from its header."""
+    width = height = None
+    if pillow_available():
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+                if image.getexif().get(0x0112) in _ROTATED:
+                    width, height = height, width
+        except (OSError, ValueError, Image.DecompressionBombError):
+            pass
+    return ImageInfo(name, st.st_size, width, height, content_hash(path), st.st_mtime_ns)
+
+def catalog():
+    """Return the Catalog of IMAGE_DIR, scanning it on first use."""
+    global _catalog
+    current = _catalog
+    if current is None or current.directory != IMAGE_DIR:
+        with _catalog_lock:
+            current = _catalog
+            if current is None or current.directory != IMAGE_DIR:
+                current = _catalog = Catalog(IMAGE_DIR)
+    return current
+
+def image_info(filename):
+    """Return the catalogued ImageInfo for filename, or None if it does not exist."""
+    return catalog().get(filename) if filename else None
+
+def catalog_version():
+    """Return a number that changes whenever an image is added, removed or edited."""
+    current = catalog()
+    current.refresh()
+    return current.version
+
+def image_names():
+    """Return the name of every catalogued image, sorted."""
+    return catalog().names()
+
+def is_valid_image(filename):
+    """Return whether filename names an image in IMAGE_DIR that can be shown.
+
+    Without Pillow any existing file passes; with it the file must also
+    decode as an image.
+    """
+    info = image_info(filename)
+    return info is not None and (info.width is not None or not pillow_available())
+
+
+class ImageSet:
+    """URLs and dimensions for rendering one image responsively."""
+
+    def __init__(self, src, srcset, sources, width, height, sizes=SIZES):
+        self.src = src            # fallback thumbnail in the original's format family
+        self.srcset = srcset      # fallback format at every width
+        self.sources = sources    # [(mime type, srcset)] for <source> elements
+        self.width = width
+        self.height = height
+        self.sizes = sizes
+
+
+def available_formats():
+    """Return the (extension, mime type) pairs Pillow can encode here."""
+    if not pillow_available():
+        return []
+    return [(ext, mime) for ext, mime in MODERN_FORMATS if features.check(ext)]
+
+def content_hash(path):
+    """Return a short SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def _save(image, name, fmt, **options):
+    """Write image to DERIVED_DIR/name atomically unless it already exists."""
+    path = os.path.join(DERIVED_DIR, name)
+    if os.path.exists(path):
+        return
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, path)
+
+def _build(path, digest):
+    """Generate any missing derivatives for the image at path; return its ImageSet."""
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        width, height = image.size
+        has_alpha = image.mode in ('RGBA', 'LA', 'P')
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        fallback_ext, fallback_fmt = ('png', 'PNG') if has_alpha else ('jpg', 'JPEG')
+        formats = available_formats()
+
+        widths = [w for w in WIDTHS if w < width] or [width]
+        fallback, modern = [], {ext: [] for ext, _ in formats}
+        for w in widths:
+            resized = image.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+
+            name = f'{digest}-{w}.{fallback_ext}'
+            _save(resized, name, fallback_fmt, optimize=True)
+            fallback.append(f'{DERIVED_URL}/{name} {w}w')
+
+            for ext, _ in formats:
+                name = f'{digest}-{w}.{ext}'
+                _save(resized, name, ext.upper(), quality=80)
+                modern[ext].append(f'{DERIVED_URL}/{name} {w}w')
+
+    sources = [(mime, ', '.join(modern[ext])) for ext, mime in formats]
+    display_height = round(height * WIDTHS[0] / width)
+    return ImageSet(fallback[0].split(' ')[0], ', '.join(fallback), sources,
+                    WIDTHS[0], display_height)
+
+def image_set(filename):
+    """Return the ImageSet for an image in IMAGE_DIR, generating it on first use.
+
+    Returns None when Pillow is missing or the file is absent or unreadable,
+    in which case callers should link the original.
+    """
+    if not pillow_available():
+        return None
+    info = image_info(filename)  # None for anything outside the catalog
+    if info is None or info.width is None:
+        return None
+
+    cached = _index.get(filename)
+    if cached is not None and cached[0] == info.digest:
+        return cached[1]
+
+    with _lock:
+        cached = _index.get(filename)
+        if cached is not None and cached[0] == info.digest:
+            return cached[1]
+        try:
+            result = _build(os.path.join(IMAGE_DIR, filename), info.digest)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            result = None
+        _index[filename] = (info.digest, result)
+        return result
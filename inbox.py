@@ -0,0 +1,179 @@
+"""Background processing for contact form messages.
+
+POST /contact only appends a row to ``messages`` and queues a job
+(DAL.add_message), so the request costs one small transaction however slow
+the work behind it is. Workers drain the queue in batches: each message is
+scored for spam, checked against recent duplicates and, if it passes,
+handed to a notifier. The queue lives in SQLite, so jobs survive restarts,
+failed jobs are retried with backoff, and any number of worker threads
+(start_worker) or processes (``flask --app app inbox work``) can share it.
+Delivery is at least once: a worker that dies mid-batch may notify twice.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import re
+import threading
+
+import DAL
+
+logger = logging.getLogger(__name__)
+
+# Messages scoring at least this are marked spam instead of delivered
+SPAM_THRESHOLD = 0.5
+
+# Seconds during which a message repeating an earlier one is a duplicate
+DEDUP_WINDOW = 86400
+
+# Seconds an idle worker waits before polling the queue again
+POLL_INTERVAL = 1.0
+
+SPAM_WORDS = ('bitcoin', 'casino', 'crypto', 'backlink', 'loan', 'seo', 'viagra', 'winner')
+
+_LINK = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+_worker = None  # Worker while the background thread is running
+
+
+def spam_score(message):
+    """Return a score from 0 (clean) to 1 (spam) for a message row."""
+    body = message['body']
+    text = body.lower()
+    score = 0.2 * min(len(_LINK.findall(body)), 3)
+    score += 0.25 * sum(word in text for word in SPAM_WORDS)
+    letters = [c for c in body if c.isalpha()]
+    if len(letters) >= 20 and sum(c.isupper() for c in letters) > 0.6 * len(letters):
+        score += 0.3  # mostly capitals
+    if not body.strip():
+        score += 0.5
+    if '@' not in message['email']:
+        score += 0.3
+    return min(score, 1.0)
+
+def fingerprint(message):
+    """Return a digest of a message's sender and whitespace-normalized text."""
+    text = ' '.join(message['body'].lower().split())
+    key = f"{message['email'].strip().lower()}\n{text}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+def log_notification(message):
+    """Default notifier: log the delivered message."""
+    logger.info('Contact message %d from %s %s <%s>', message['id'],
+                message['first_name'], message['last_name'], message['email'])
+
+def process_batch(jobs, notify=log_notification):
+    """Process claimed message jobs; return how many were finished.
+
+    A job whose notification raises is handed back to the queue to be
+    retried; the rest are recorded together in one transaction.
+    """
+    messages = DAL.get_messages(job.ref_id for job in jobs)
+    seen = set()  # fingerprints in this batch, not yet written
+    results = []
+    for job in jobs:
+        message = messages.get(job.ref_id)
+        if message is None:
+            results.append((job, None, None, None))
+            continue
+        digest = fingerprint(message)
+        score = spam_score(message)
+        if score >= SPAM_THRESHOLD:
+            status = 'spam'
+        elif digest in seen or DAL.find_duplicate_message(message, digest, DEDUP_WINDOW):
+            status = 'duplicate'
+        else:
+            try:
+                notify(message)
+            except Exception as exc:
+                logger.warning('Notifying message %d failed (attempt %d): %s',
+                               message['id'], job.attempts, exc)
+                DAL.fail_job(job, exc)
+                continue
+            status = 'delivered'
+        seen.add(digest)
+        results.append((job, status, score, digest))
+
+    if results:
+        DAL.finish_message_jobs(results)
+    return len(results)
+
+def process_pending(notify=log_notification, batch_size=DAL.JOB_BATCH_SIZE):
+    """Drain every due message job in this thread; return how many were finished."""
+    total = 0
+    while True:
+        jobs = DAL.claim_jobs('message', batch_size)
+        if not jobs:
+            return total
+        total += process_batch(jobs, notify)
+
+
+class Worker:
+    """Thread that processes message jobs until closed.
+
+    It sleeps up to POLL_INTERVAL between empty polls; wake() cuts the wait
+    short when a request has just queued a message.
+    """
+
+    def __init__(self, notify=log_notification, interval=POLL_INTERVAL,
+                 batch_size=DAL.JOB_BATCH_SIZE):
+        self.notify = notify
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='inbox-worker', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def close(self):
+        """Finish the current batch, then stop the thread."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                jobs = DAL.claim_jobs('message', self.batch_size)
+                if jobs:
+                    process_batch(jobs, self.notify)
+                    continue
+            except Exception:
+                logger.exception('Message worker failed')
+            self._wake.wait(self.interval)
+        DAL.release_connection()
+
+def start_worker(notify=log_notification, interval=POLL_INTERVAL):
+    """Start the background message worker for this process."""
+    global _worker
+    if _worker is None:
+        _worker = Worker(notify, interval)
+        atexit.register(stop_worker)
+    return _worker
+
+def stop_worker():
+    """Stop the background message worker; queued jobs stay queued."""
+    global _worker
+    worker, _worker = _worker, None
+    if worker is not None:
+        worker.close()
+        atexit.unregister(stop_worker)
+
+def wake():
+    """Tell this process's worker, if any, that a job was just queued."""
+    worker = _worker
+    if worker is not None:
+        worker.wake()
+
+def _after_fork():
+    # Threads do not survive fork (e.g. gunicorn --preload); restart ours
+    global _worker
+    if _worker is not None:
+        _worker = Worker(_worker.notify, _worker.interval, _worker.batch_size)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
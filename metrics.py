@@ -0,0 +1,294 @@
+"""Request, DAL, SQL and template timings exported in Prometheus format.
+
+Nothing is hooked in unless ``init_app`` is called for an app with METRICS
+enabled, so a disabled app pays nothing per request or query. Once enabled
+it records:
+
+- request latency and response size per endpoint,
+- call latency of each DAL function,
+- SQL statement counts and durations,
+- template render time,
+
+served at ``/metrics``. With SERVER_TIMING also enabled, every response
+carries a ``Server-Timing`` header breaking its time into db, render and app.
+Values are per process; scrape each worker, or aggregate in Prometheus.
+"""
+import functools
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, before_render_template, request, template_rendered
+
+import DAL
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# DAL functions wrapped with timers
+DAL_FUNCTIONS = (
+    'init_db', 'data_version', 'get_project', 'get_projects', 'get_projects_page',
+    'search_projects', 'add_project', 'update_project', 'delete_project', 'add_projects_bulk',
+    'export_projects', 'add_message',
+)
+# DAL generators, timed over every row they yield (the time spent inside
+# them, not the caller's time between rows)
+DAL_GENERATORS = ('iter_projects',)
+# DAL classes whose constructor runs a query (ProjectPage reads its first row)
+DAL_CLASSES = ('ProjectPage',)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Named histograms and counters, each split by label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> [kind, help, buckets, {labels: value}]
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        self._metrics.setdefault(name, ['histogram', help, buckets, {}])
+
+    def counter(self, name, help):
+        self._metrics.setdefault(name, ['counter', help, None, {}])
+
+    def gauge(self, name, help):
+        self._metrics.setdefault(name, ['gauge', help, None, {}])
+
+    def observe(self, name, value, **labels):
+        """Record value in histogram name."""
+        _, _, buckets, series = self._metrics[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set(self, name, value, **labels):
+        """Overwrite counter or gauge name with a value tracked elsewhere."""
+        series = self._metrics[name][3]
+        with self._lock:
+            series[tuple(sorted(labels.items()))] = value
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to counter name."""
+        series = self._metrics[name][3]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series[key] = series.get(key, 0) + amount
+
+    def clear(self):
+        """Drop every recorded value, keeping the metric definitions."""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric[3].clear()
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (kind, help, buckets, series) in sorted(self._metrics.items()):
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(series.items()):
+                    if kind != 'histogram':
+                        lines.append(f'{name}{_labels(key)} {value}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(key, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(key)} {value.sum}')
+                    lines.append(f'{name}_count{_labels(key)} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+registry = Registry()
+registry.histogram('http_request_duration_seconds', 'Time spent handling a request.')
+registry.histogram('http_response_size_bytes', 'Response body size on the wire.', SIZE_BUCKETS)
+registry.histogram('dal_call_duration_seconds', 'Time spent in a DAL function.')
+registry.histogram('sql_query_duration_seconds', 'Time spent executing one SQL statement.')
+registry.counter('sql_queries_total', 'SQL statements executed.')
+registry.histogram('template_render_duration_seconds', 'Time spent rendering a template.')
+registry.counter('dal_cache_requests_total', 'DAL read cache lookups by result.')
+registry.gauge('dal_replica_lag_seconds', 'Seconds the read replica may trail the primary.')
+registry.counter('dal_replica_refreshes_total', 'Replica refreshes made by this process.')
+registry.gauge('dal_replica_refresh_duration_seconds', 'Time the last replica refresh took.')
+registry.gauge('inbox_jobs', 'Contact message jobs by state (due jobs are also queued).')
+
+_state = threading.local()  # per-request timings: start, sql_count, sql_time, render_time
+_originals = {}  # patched attribute -> original, while instrumentation is installed
+
+
+def _timed_dal(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.observe('dal_call_duration_seconds', time.perf_counter() - start, function=name)
+    return wrapper
+
+def _timed_iter(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        rows = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    row = next(rows)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield row
+        finally:
+            rows.close()
+            registry.observe('dal_call_duration_seconds', elapsed, function=name)
+    return wrapper
+
+def _timed_sql(method):
+    @functools.wraps(method)
+    def wrapper(conn, sql, *args):
+        start = time.perf_counter()
+        try:
+            return method(conn, sql, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.observe('sql_query_duration_seconds', elapsed)
+            registry.inc('sql_queries_total')
+            if getattr(_state, 'start', None) is not None:
+                _state.sql_count += 1
+                _state.sql_time += elapsed
+    return wrapper
+
+def install():
+    """Wrap DAL functions and SQL execution with timers (idempotent)."""
+    if _originals:
+        return
+    for name in DAL_FUNCTIONS:
+        func = getattr(DAL, name)
+        _originals[(DAL, name)] = func
+        setattr(DAL, name, _timed_dal(name, func))
+    for name in DAL_GENERATORS:
+        func = getattr(DAL, name)
+        _originals[(DAL, name)] = func
+        setattr(DAL, name, _timed_iter(name, func))
+    for name in DAL_CLASSES:
+        cls = getattr(DAL, name)
+        _originals[(cls, '__init__')] = cls.__dict__['__init__']
+        cls.__init__ = _timed_dal(name, cls.__init__)
+    for name in ('execute', 'executemany', 'executescript'):
+        _originals[(DAL._Connection, name)] = DAL._Connection.__dict__.get(name)
+        setattr(DAL._Connection, name, _timed_sql(getattr(sqlite3.Connection, name)))
+
+def uninstall():
+    """Remove every wrapper install() added."""
+    for (owner, name), original in _originals.items():
+        if original is None:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+    _originals.clear()
+
+
+def _before_request():
+    _state.start = time.perf_counter()
+    _state.sql_count = 0
+    _state.sql_time = 0.0
+    _state.render_time = 0.0
+
+def _after_request(response):
+    start = getattr(_state, 'start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or 'unmatched'
+
+    registry.observe('http_request_duration_seconds', elapsed, endpoint=endpoint,
+                     method=request.method, status=response.status_code)
+    if response.content_length is not None:
+        registry.observe('http_response_size_bytes', response.content_length, endpoint=endpoint)
+
+    if _state.server_timing:
+        response.headers['Server-Timing'] = (
+            f'db;dur={_state.sql_time * 1000:.2f};desc="{_state.sql_count} queries", '
+            f'render;dur={_state.render_time * 1000:.2f}, '
+            f'app;dur={elapsed * 1000:.2f}')
+    _state.start = None
+    return response
+
+def _before_render(sender, template, context, **extra):
+    _state.render_start = time.perf_counter()
+
+def _rendered(sender, template, context, **extra):
+    started = getattr(_state, 'render_start', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    _state.render_start = None
+    registry.observe('template_render_duration_seconds', elapsed, template=template.name)
+    if getattr(_state, 'start', None) is not None:
+        _state.render_time += elapsed
+
+def metrics_view():
+    """Serve every metric in the Prometheus text format."""
+    stats = DAL.project_cache.stats()
+    registry.set('dal_cache_requests_total', stats['hits'], cache='projects', result='hit')
+    registry.set('dal_cache_requests_total', stats['misses'], cache='projects', result='miss')
+    replica = DAL.replica_status()
+    if replica['mode'] == 'replica':
+        registry.set('dal_replica_lag_seconds', replica['lag'])
+        registry.set('dal_replica_refreshes_total', replica['refreshes'])
+        if replica['last_duration'] is not None:
+            registry.set('dal_replica_refresh_duration_seconds', replica['last_duration'])
+    for state, count in DAL.job_counts().items():
+        registry.set('inbox_jobs', count, state=state)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+def init_app(app):
+    """Instrument app if its METRICS setting is on; otherwise do nothing."""
+    if not app.config.get('METRICS'):
+        return
+    install()
+    server_timing = bool(app.config.get('SERVER_TIMING'))
+
+    def before_request():
+        _before_request()
+        _state.server_timing = server_timing
+
+    app.before_request(before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
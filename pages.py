@@ -0,0 +1,88 @@
+"""Render-once cache for pages whose templates take no data.
+
+``render_page`` renders a template once, keeps the HTML together with its
+gzip/brotli encodings, and serves it with an ETag and Last-Modified so
+browsers revalidate with a 304. A page is re-rendered only when the mtime of
+its template, or of a template it extends or includes, changes.
+"""
+import hashlib
+import os
+import threading
+
+from flask import Response, current_app, render_template, request
+from jinja2 import meta
+
+import assets
+
+_pages = {}  # template name -> Page
+_lock = threading.Lock()
+
+
+class Page:
+    """One pre-rendered page and the template files it was rendered from."""
+
+    def __init__(self, body, sources):
+        self.body = body
+        self.sources = sources  # template path -> mtime at render time
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.last_modified = max(sources.values())
+        self.encoded = assets.compress(body)
+
+    def is_current(self):
+        """Return True if no source template has changed since rendering."""
+        try:
+            return all(os.stat(path).st_mtime == mtime for path, mtime in self.sources.items())
+        except OSError:
+            return False
+
+
+def _template_sources(env, name, sources):
+    """Add name and every template it extends or includes to sources."""
+    source, path, _ = env.loader.get_source(env, name)
+    sources[path] = os.stat(path).st_mtime
+    for ref in meta.find_referenced_templates(env.parse(source)):
+        if ref is not None and ref not in sources:
+            _template_sources(env, ref, sources)
+    return sources
+
+def _render(name):
+    env = current_app.jinja_env
+    stale = name in _pages
+    sources = _template_sources(env, name, {})  # stat before rendering
+    if stale and env.cache is not None:
+        env.cache.clear()  # make Jinja reload the edited template too
+    return Page(render_template(name).encode('utf-8'), sources)
+
+def get_page(name):
+    """Return the current Page for template name, rendering it if needed."""
+    page = _pages.get(name)
+    if page is None or not page.is_current():
+        with _lock:
+            page = _pages.get(name)
+            if page is None or not page.is_current():
+                page = _pages[name] = _render(name)
+    return page
+
+def render_page(name):
+    """Return a conditional, content-negotiated response for template name."""
+    page = get_page(name)
+
+    coding = assets.negotiate(page.encoded)
+    if coding is not None:
+        response = Response(page.encoded[coding], mimetype='text/html')
+        response.content_encoding = coding
+        response.set_etag(f'{page.etag}-{coding}')
+    else:
+        response = Response(page.body, mimetype='text/html')
+        response.set_etag(page.etag)
+
+    response.vary.add('Accept-Encoding')
+    response.last_modified = page.last_modified
+    response.cache_control.no_cache = True  # always revalidate; expect a 304
+    return response.make_conditional(request)
+
+def prerender(app, names):
+    """Render every template in names up front, e.g. at startup."""
+    with app.test_request_context():
+        for name in names:
+            get_page(name)
@@ -0,0 +1,141 @@
+"""Token-bucket rate limiting for write routes.
+
+Every client (by remote address) has a bucket holding up to WRITE_BURST
+tokens that refills at WRITE_RATE tokens per second. Each write request
+takes one token; when the bucket is empty the request is answered with 429
+and a Retry-After header before it reaches the database, so a burst of
+writes cannot tie up SQLite's write lock while readers wait.
+
+Buckets live in memory, per process, unless RATE_LIMIT_DB names an SQLite
+file: then every worker process shares them. That file is kept apart from
+projects.db so limiter writes never invalidate the project caches.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+# Most client buckets kept in memory; the least recently used go first
+MAX_CLIENTS = 10000
+
+# Request methods that spend a token
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+
+class MemoryBuckets:
+    """Token buckets for one process, held in an LRU-bounded dict."""
+
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> (tokens, monotonic time)
+        self._lock = threading.Lock()
+
+    def take(self, key, cost=1):
+        """Spend cost tokens from key's bucket; return 0, or seconds until it could."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (cost - tokens) / self.rate
+
+
+class SQLiteBuckets:
+    """Token buckets shared by every process using the same SQLite file.
+
+    Refill and spend happen in one UPSERT, so concurrent workers cannot both
+    take the last token. Buckets idle long enough to be full again are
+    deleted now and then to keep the table small.
+    """
+
+    PRUNE_EVERY = 1000  # takes between sweeps of full buckets
+
+    def __init__(self, path, rate, burst):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit: every statement below is its own transaction
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')  # losing a bucket only forgives a client
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, cost=1):
+        """Spend cost tokens from key's bucket; return 0, or seconds until it could."""
+        conn = self._connection()
+        params = {'key': key, 'cost': cost, 'now': time.time(),
+                  'rate': self.rate, 'burst': self.burst}
+        spent = conn.execute('''
+            INSERT INTO buckets (key, tokens, updated) VALUES (:key, :burst - :cost, :now)
+            ON CONFLICT (key) DO UPDATE
+            SET tokens = min(:burst, tokens + (:now - updated) * :rate) - :cost, updated = :now
+            WHERE min(:burst, tokens + (:now - updated) * :rate) >= :cost
+            RETURNING tokens
+        ''', params).fetchone()
+
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM buckets WHERE updated < ?',
+                         (params['now'] - self.burst / self.rate,))
+
+        if spent is not None:
+            return 0.0
+        tokens, updated = conn.execute(
+            'SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        tokens = min(self.burst, tokens + (params['now'] - updated) * self.rate)
+        return max(cost - tokens, 0.0) / self.rate
+
+
+def limit_writes(view):
+    """Answer 429 to write requests from a client whose bucket is empty."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        buckets = current_app.extensions.get('rate_limit')
+        if buckets is not None and request.method in WRITE_METHODS:
+            wait = buckets.take(request.remote_addr or '-')
+            if wait:
+                response = make_response('Too many requests, please slow down.\n', 429)
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                response.mimetype = 'text/plain'
+                return response
+        return view(*args, **kwargs)
+    return wrapper
+
+def init_app(app):
+    """Create app's token buckets from WRITE_RATE, WRITE_BURST and RATE_LIMIT_DB.
+
+    A WRITE_RATE of 0 turns rate limiting off.
+    """
+    rate, burst = app.config['WRITE_RATE'], app.config['WRITE_BURST']
+    if not rate:
+        app.extensions.pop('rate_limit', None)
+    elif app.config['RATE_LIMIT_DB']:
+        app.extensions['rate_limit'] = SQLiteBuckets(app.config['RATE_LIMIT_DB'], rate, burst)
+    else:
+        app.extensions['rate_limit'] = MemoryBuckets(rate, burst)
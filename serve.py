@@ -0,0 +1,91 @@
+"""Production entry point: gunicorn workers serving create_app().
+
+Configured through environment variables:
+
+    HOST, PORT               address to bind (default 0.0.0.0:5000)
+    WEB_CONCURRENCY          worker processes (default 2 x CPU count + 1)
+    THREADS                  threads per worker (default 2; >1 uses gthread)
+    PRELOAD_APP              1 to build the app once in the master before
+                             forking, so workers start faster and share memory
+    TIMEOUT                  seconds before a silent worker is restarted (30)
+    GRACEFUL_TIMEOUT         seconds workers get to finish on shutdown (30)
+    KEEPALIVE                seconds to hold idle keep-alive connections (5)
+    MAX_REQUESTS             recycle a worker after this many requests (0 = never)
+    MAX_REQUESTS_JITTER      random spread added to MAX_REQUESTS (0)
+    ACCESS_LOG               '-' to log requests to stdout (off by default)
+    FLASK_INBOX_WORKER       false to run no contact-message thread in the
+                             workers, e.g. when `flask inbox work` runs
+                             separately (on by default)
+
+Usage:
+    python serve.py
+"""
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+import DAL
+import inbox
+from app import create_app
+
+
+def _env_int(environ, name, default):
+    value = environ.get(name, '').strip()
+    return int(value) if value else default
+
+def _env_bool(environ, name, default):
+    value = environ.get(name, '').strip().lower()
+    return value in ('1', 'true', 'yes') if value else default
+
+def options_from_env(environ=os.environ):
+    """Return gunicorn settings derived from environ."""
+    threads = _env_int(environ, 'THREADS', 2)
+    options = {
+        'bind': f"{environ.get('HOST', '0.0.0.0')}:{_env_int(environ, 'PORT', 5000)}",
+        'workers': _env_int(environ, 'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1),
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': _env_bool(environ, 'PRELOAD_APP', False),
+        'timeout': _env_int(environ, 'TIMEOUT', 30),
+        'graceful_timeout': _env_int(environ, 'GRACEFUL_TIMEOUT', 30),
+        'keepalive': _env_int(environ, 'KEEPALIVE', 5),
+        'max_requests': _env_int(environ, 'MAX_REQUESTS', 0),
+        'max_requests_jitter': _env_int(environ, 'MAX_REQUESTS_JITTER', 0),
+    }
+    if environ.get('ACCESS_LOG'):
+        options['accesslog'] = environ['ACCESS_LOG']
+    return options
+
+
+class Server(BaseApplication):
+    """gunicorn application that builds the Flask app with create_app()."""
+
+    def __init__(self, options, inbox_worker=True):
+        self.options = options
+        self.inbox_worker = inbox_worker  # started by post_worker_init
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_worker_init', post_worker_init)
+
+    def load(self):
+        # With PRELOAD_APP this runs in the master: SQLite handles must not
+        # be inherited by forked workers, so drop them before forking. The
+        # inbox worker thread (which holds its own connection) is therefore
+        # started by post_worker_init instead, in each worker, if enabled
+        app = create_app({'PRERENDER_PAGES': True, 'INBOX_WORKER': False})
+        DAL.close_all()
+        return app
+
+
+def post_worker_init(worker):
+    """gunicorn hook: start the inbox worker thread in each worker process."""
+    if worker.app.inbox_worker:
+        inbox.start_worker()
+
+
+if __name__ == '__main__':
+    Server(options_from_env(), _env_bool(os.environ, 'FLASK_INBOX_WORKER', True)).run()
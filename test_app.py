@@ -1,9 +1,11 @@
 import pytest
 import tempfile
 import os
-from app import app
+from app import create_app
 import DAL
 
+app = create_app()
+
 class TestFlaskApp:
     """Test cases for Flask application routes and functionality."""
     
@@ -26,6 +28,9 @@ class TestFlaskApp:
     
     def teardown_method(self):
         """Clean up after each test."""
+        # Close pooled connections so SQLite can clean up its WAL files
+        DAL.close_all()
+        
         # Restore original DB_FILE
         DAL.DB_FILE = self.original_db_file
         
@@ -85,7 +90,7 @@ class TestFlaskApp:
         form_data = {
             'title': 'Test Project',
             'description': 'This is a test project',
-            'image_file_name': 'test.jpg'
+            'image_file_name': 'project.jpg'
         }
         
         response = self.client.post('/form', data=form_data)
@@ -96,7 +101,7 @@ class TestFlaskApp:
         form_data = {
             'title': '',  # Empty title
             'description': 'This is a test project',
-            'image_file_name': 'test.jpg'
+            'image_file_name': 'project.jpg'
         }
         
         response = self.client.post('/form', data=form_data)
@@ -107,7 +112,7 @@ class TestFlaskApp:
         form_data = {
             'title': 'Test Project',
             'description': 'This is a test project',
-            'image_file_name': 'test.jpg'
+            'image_file_name': 'project.jpg'
         }
         
         response = self.client.post('/form', data=form_data, follow_redirects=True)
@@ -147,6 +152,25 @@ class TestFlaskApp:
         # This might return 404 if CSS file doesn't exist, which is expected
         assert response.status_code in [200, 404]
     
+    def test_request_releases_connection(self):
+        """Test that the app context teardown returns the DB connection to the pool."""
+        self.client.get('/projects')
+        assert getattr(DAL._local, 'conn', None) is None
+        assert any(db_file == DAL.DB_FILE for db_file, _ in DAL._pool)
+    
+    def test_projects_cli_import_export(self):
+        """Test the 'flask projects import/export' commands."""
+        runner = app.test_cli_runner()
+        
+        data = 'title,description,image_file_name\nCLI Project,Imported,cli.jpg\n'
+        result = runner.invoke(args=['projects', 'import', '-', '--format', 'csv'], input=data)
+        assert result.exit_code == 0
+        assert DAL.get_projects()[0]['title'] == 'CLI Project'
+        
+        result = runner.invoke(args=['projects', 'export', '-', '--format', 'jsonl'])
+        assert result.exit_code == 0
+        assert '"title": "CLI Project"' in result.output
+    
     def test_nonexistent_route(self):
         """Test accessing a non-existent route."""
         response = self.client.get('/nonexistent')
@@ -157,6 +181,45 @@ class TestFlaskApp:
         assert app.config['TESTING'] == True
         assert app.name == 'app'
     
+    def test_create_app_config(self, monkeypatch):
+        """Test config precedence: defaults, FLASK_ env vars, then arguments."""
+        monkeypatch.setenv('FLASK_STREAM_PROJECTS', 'true')
+        configured = create_app()
+        assert configured.config['STREAM_PROJECTS'] is True
+        
+        configured = create_app({'STREAM_PROJECTS': False, 'DATABASE': self.temp_db.name})
+        assert configured.config['STREAM_PROJECTS'] is False
+        assert DAL.DB_FILE == self.temp_db.name
+    
+    def test_create_app_leaves_database_untouched(self):
+        """Test that building the app opens no connection; the first request migrates."""
+        path = self.temp_db.name + '.lazy.db'
+        try:
+            configured = create_app({'TESTING': True, 'DATABASE': path})
+            assert not os.path.exists(path)
+            assert configured.test_client().get('/projects').status_code == 200
+            assert os.path.exists(path)
+        finally:
+            DAL.close_all()
+            DAL.DB_FILE = self.temp_db.name
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+    
+    def test_write_behind_form_submission(self):
+        """Test that /form waits for a queued write before redirecting."""
+        DAL.start_write_queue()
+        try:
+            form_data = {
+                'title': 'Queued Project',
+                'description': 'Written behind',
+                'image_file_name': 'project.jpg'
+            }
+            response = self.client.post('/form', data=form_data, follow_redirects=True)
+            assert b'Queued Project' in response.data
+        finally:
+            DAL.stop_write_queue()
+    
     def test_all_routes_return_html(self):
         """Test that all main routes return HTML content."""
         routes = ['/', '/about', '/projects', '/resume', '/contact', '/form', '/thankyou']
@@ -174,7 +237,7 @@ class TestFlaskApp:
         form_data = {
             'title': '',
             'description': 'Valid description',
-            'image_file_name': 'valid.jpg'
+            'image_file_name': 'project.jpg'
         }
         response = self.client.post('/form', data=form_data)
         assert response.status_code == 200  # Should stay on form
@@ -183,7 +246,7 @@ class TestFlaskApp:
         form_data = {
             'title': 'Valid title',
             'description': '',
-            'image_file_name': 'valid.jpg'
+            'image_file_name': 'project.jpg'
         }
         response = self.client.post('/form', data=form_data)
         assert response.status_code == 200  # Should stay on form
@@ -207,7 +270,7 @@ class TestFlaskApp:
         form_data = {
             'title': 'Workflow Test Project',
             'description': 'Testing the complete workflow',
-            'image_file_name': 'workflow.jpg'
+            'image_file_name': 'project.jpg'
         }
         
         response = self.client.post('/form', data=form_data, follow_redirects=True)
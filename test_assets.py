@@ -0,0 +1,206 @@
+import pytest
+import gzip
+import os
+import re
+import tempfile
+from app import create_app
+import assets
+
+app = create_app()
+
+
+class TestAssets:
+    """Test cases for fingerprinted static assets."""
+    
+    def setup_method(self):
+        """Set up test environment for each test."""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with open(os.path.join(assets.ASSET_DIRS['css_file'], 'styles.css'), 'rb') as f:
+            self.css = f.read()
+    
+    def css_url(self):
+        """Return the stylesheet URL linked from the home page."""
+        response = self.client.get('/')
+        return re.search(rb'href="(/css/[^"]+)"', response.data).group(1).decode()
+    
+    def test_pages_link_hashed_urls(self):
+        """Test that url_for rewrites asset URLs to content-hashed names."""
+        digest = assets._manifest[('css_file', 'styles.css')].split('.')[1]
+        assert self.css_url() == f'/css/styles.{digest}.css'
+        
+        response = self.client.get('/resume')
+        assert re.search(rb'/static/assets/Krishna_Shah_Resume\.[0-9a-f]{12}\.pdf', response.data)
+    
+    def test_hashed_url_is_immutable(self):
+        """Test long-lived caching headers and a strong ETag on hashed URLs."""
+        response = self.client.get(self.css_url())
+        assert response.status_code == 200
+        assert response.data == self.css
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == assets.MAX_AGE
+        assert not response.headers['ETag'].startswith('W/')
+    
+    @pytest.mark.parametrize('coding', ['gzip', 'br'])
+    def test_precompressed_bodies(self, coding):
+        """Test that text assets are served precompressed when accepted."""
+        if coding == 'br':
+            brotli = pytest.importorskip('brotli')
+            decompress = brotli.decompress
+        else:
+            decompress = gzip.decompress
+        
+        response = self.client.get(self.css_url(), headers={'Accept-Encoding': coding})
+        assert response.headers['Content-Encoding'] == coding
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert decompress(response.data) == self.css
+    
+    def test_conditional_get(self):
+        """Test that a matching If-None-Match is answered with 304."""
+        url = self.css_url()
+        for headers in ({}, {'Accept-Encoding': 'gzip'}):
+            etag = self.client.get(url, headers=headers).headers['ETag']
+            response = self.client.get(url, headers={**headers, 'If-None-Match': etag})
+            assert response.status_code == 304
+    
+    def test_binary_assets_not_recompressed(self):
+        """Test that images are sent as-is even when gzip is accepted."""
+        hashed = assets._manifest[('static', 'images/IoT.png')]
+        response = self.client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert response.cache_control.immutable
+        response.close()
+    
+    def test_unhashed_urls_still_served(self):
+        """Test that plain asset URLs work without immutable caching."""
+        response = self.client.get('/css/styles.css')
+        assert response.status_code == 200
+        assert not response.cache_control.immutable
+        response.close()
+        
+        response = self.client.get('/static/images/IoT.png')
+        assert response.status_code == 200
+        response.close()
+        
+        for client in (self.client, create_app({'TESTING': True, 'STATIC_FILE_CACHE': False}).test_client()):
+            response = client.get('/static/derived/../images/IoT.png')
+            assert response.status_code == 200
+            assert not response.cache_control.immutable
+            response.close()
+        
+        assert self.client.get('/static/images/missing.png').status_code == 404
+    
+    def png_url(self):
+        """Return the hashed URL and contents of IoT.png."""
+        with open(os.path.join(assets.ASSET_DIRS['static'], 'images', 'IoT.png'), 'rb') as f:
+            return '/static/' + assets._manifest[('static', 'images/IoT.png')], f.read()
+    
+    def test_byte_ranges(self):
+        """Test that Range requests get 206 with the requested bytes."""
+        url, data = self.png_url()
+        response = self.client.get(url)
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert response.data == data
+        
+        response = self.client.get(url, headers={'Range': 'bytes=10-99'})
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == f'bytes 10-99/{len(data)}'
+        assert response.data == data[10:100]
+        
+        response = self.client.get(url, headers={'Range': 'bytes=-50'})
+        assert response.status_code == 206
+        assert response.data == data[-50:]
+        
+        response = self.client.get(url, headers={'Range': f'bytes={len(data)}-'})
+        assert response.status_code == 416
+        assert response.headers['Content-Range'] == f'bytes */{len(data)}'
+    
+    def test_if_range(self):
+        """Test that a stale If-Range gets the whole file instead of a range."""
+        url, data = self.png_url()
+        etag = self.client.get(url).headers['ETag']
+        
+        response = self.client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        assert response.status_code == 206
+        assert response.data == data[:10]
+        
+        response = self.client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        assert response.status_code == 200
+        assert response.data == data
+    
+    def test_file_cache_reuses_descriptors(self, tmp_path):
+        """Test that files are opened once, evicted LRU and reopened when changed."""
+        cache = assets.FileCache(maxsize=2)
+        paths = []
+        for name in ('a', 'b', 'c'):
+            paths.append(tmp_path / name)
+            paths[-1].write_bytes(name.encode() * 10)
+        
+        first = cache.open(str(paths[0]))
+        assert cache.open(str(paths[0])) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+        
+        cache.open(str(paths[1]))
+        cache.open(str(paths[2]))
+        assert list(cache._files) == [str(paths[1]), str(paths[2])]
+        
+        paths[2].write_bytes(b'changed')
+        os.utime(paths[2], ns=(0, 0))
+        changed = cache.open(str(paths[2]))
+        assert changed.size == 7
+        assert assets.FileRange(changed, 0, 7).read() == b'changed'
+    
+    def test_truncated_file_ends_body_early(self, tmp_path):
+        """Test that a file shrinking under an open response ends it instead of faulting."""
+        path = tmp_path / 'big.bin'
+        path.write_bytes(b'x' * 100000)
+        opened = assets.FileCache().open(str(path))
+        window = assets.FileRange(opened, 50000, 100000)
+        
+        with open(path, 'r+b') as f:
+            f.truncate(60000)
+        assert window.read(5000) == b'x' * 5000
+        assert window.read(20000) == b'x' * 5000
+        assert window.read() == b''
+    
+    def test_edited_fingerprinted_file(self):
+        """Test that a hashed URL whose file was edited in place is re-read, not immutable."""
+        original = assets.ASSET_DIRS['static']
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'doc.pdf')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100000)
+            assets.ASSET_DIRS['static'] = directory
+            try:
+                assets.build_manifest()
+                url = '/static/' + assets._manifest[('static', 'doc.pdf')]
+                response = self.client.get(url)
+                assert response.data == b'x' * 100000
+                assert response.cache_control.immutable
+                response.close()
+                
+                with open(path, 'r+b') as f:
+                    f.truncate(10)
+                    f.write(b'y' * 10)
+                response = self.client.get(url)
+                assert response.data == b'y' * 10
+                assert not response.cache_control.immutable
+                response.close()
+            finally:
+                assets.ASSET_DIRS['static'] = original
+                assets.build_manifest()
+    
+    def test_send_file_fallback(self):
+        """Test that STATIC_FILE_CACHE = False still serves assets and ranges."""
+        url, data = self.png_url()
+        client = create_app({'TESTING': True, 'STATIC_FILE_CACHE': False}).test_client()
+        response = client.get(url)
+        assert response.data == data
+        assert response.cache_control.immutable
+        response.close()
+        
+        response = client.get('/static/images/IoT.png', headers={'Range': 'bytes=0-9'})
+        assert response.status_code == 206
+        assert response.data == data[:10]
+        response.close()
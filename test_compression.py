@@ -0,0 +1,95 @@
+import pytest
+import gzip
+import os
+import tempfile
+from flask import Response
+from app import create_app
+import compression
+import DAL
+
+app = create_app()
+
+
+class TestCompression:
+    """Test cases for the response compression layer."""
+    
+    def setup_method(self):
+        """Set up test environment for each test."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+        DAL.init_db()
+        for i in range(20):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        compression.cache.clear()
+    
+    def teardown_method(self):
+        """Clean up after each test."""
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_projects_gzip(self):
+        """Test that /projects is gzipped when the client accepts it."""
+        plain = self.client.get('/projects')
+        assert 'Content-Encoding' not in plain.headers
+        
+        response = self.client.get('/projects', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data) == plain.data
+        assert len(response.data) < len(plain.data) / 3
+    
+    def test_projects_brotli_preferred(self):
+        """Test that brotli wins when both encodings are accepted."""
+        brotli = pytest.importorskip('brotli')
+        plain = self.client.get('/projects').data
+        response = self.client.get('/projects', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == plain
+    
+    def test_compressed_body_cached_by_etag(self):
+        """Test that an unchanged page is compressed only once."""
+        headers = {'Accept-Encoding': 'gzip'}
+        self.client.get('/projects', headers=headers)
+        self.client.get('/projects', headers=headers)
+        assert compression.cache.stats()['hits'] == 1
+    
+    def test_compressed_conditional_get(self):
+        """Test that the encoded ETag revalidates to a 304."""
+        headers = {'Accept-Encoding': 'gzip'}
+        etag = self.client.get('/projects', headers=headers).headers['ETag']
+        assert etag.endswith('-gzip"')
+        
+        response = self.client.get('/projects', headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 304
+    
+    def test_streamed_response_gzipped(self):
+        """Test that streamed pages are gzipped on the fly."""
+        plain = self.client.get('/projects').data
+        app.config['STREAM_PROJECTS'] = True
+        try:
+            response = self.client.get('/projects', headers={'Accept-Encoding': 'gzip'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert gzip.decompress(response.data) == plain
+        finally:
+            app.config['STREAM_PROJECTS'] = False
+    
+    def test_skips_small_binary_and_encoded_bodies(self):
+        """Test that small, non-text and already-encoded responses are untouched."""
+        cases = [
+            Response('tiny', mimetype='text/html'),
+            Response(b'\x89PNG' * 1000, mimetype='image/png'),
+            Response(b'x' * 1000, mimetype='text/html', headers={'Content-Encoding': 'br'}),
+        ]
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            for response in cases:
+                body = response.get_data()
+                compression.compress_response(response)
+                assert response.get_data() == body
+                assert response.headers.get('Content-Encoding') in (None, 'br')
@@ -1,7 +1,10 @@
 import pytest
 import sqlite3
 import os
+import io
 import tempfile
+import threading
+import time
 import DAL
 
 class TestDatabase:
@@ -22,6 +25,9 @@ class TestDatabase:
     
     def teardown_method(self):
         """Clean up after each test."""
+        # Close pooled connections so SQLite can clean up its WAL files
+        DAL.close_all()
+        
         # Restore original DB_FILE
         DAL.DB_FILE = self.original_db_file
         
@@ -135,3 +141,537 @@ class TestDatabase:
         # IDs should be different and incrementing
         assert projects[0]['id'] != projects[1]['id']
         assert projects[0]['id'] > projects[1]['id']  # Newer project has higher ID
+
+    def test_connection_reused_within_thread(self):
+        """Test that repeated calls share one pooled connection."""
+        assert DAL.get_connection() is DAL.get_connection()
+
+    def test_connection_pragmas(self):
+        """Test that pooled connections are configured on open."""
+        conn = DAL.get_connection()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+    def test_release_connection_returns_to_pool(self):
+        """Test that a released connection is handed out again."""
+        conn = DAL.get_connection()
+        DAL.release_connection()
+        assert DAL.get_connection() is conn
+
+    def test_connection_follows_db_file(self):
+        """Test that switching DB_FILE opens a fresh connection."""
+        conn = DAL.get_connection()
+        other_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        other_db.close()
+        try:
+            DAL.DB_FILE = other_db.name
+            assert DAL.get_connection() is not conn
+        finally:
+            DAL.close_all()
+            DAL.DB_FILE = self.temp_db.name
+            os.unlink(other_db.name)
+
+    def test_get_projects_keyset(self):
+        """Test keyset pagination arguments of get_projects."""
+        for i in range(1, 6):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        ids = [p['id'] for p in DAL.get_projects()]
+
+        older = DAL.get_projects(after_id=ids[1], limit=2)
+        assert [p['id'] for p in older] == ids[2:4]
+
+        newer = DAL.get_projects(before_id=ids[3], limit=2)
+        assert [p['id'] for p in newer] == ids[1:3]
+
+    def test_get_projects_page_cursors(self):
+        """Test that pages report prev/next cursors only where rows exist."""
+        for i in range(1, 6):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        ids = [p['id'] for p in DAL.get_projects()]
+
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(limit=2)
+        assert [r['id'] for r in rows] == ids[0:2]
+        assert prev_cursor is None and next_cursor == ids[1]
+
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(after_id=next_cursor, limit=2)
+        assert [r['id'] for r in rows] == ids[2:4]
+        assert prev_cursor == ids[2] and next_cursor == ids[3]
+
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(after_id=next_cursor, limit=2)
+        assert [r['id'] for r in rows] == ids[4:]
+        assert next_cursor is None
+
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(before_id=ids[2], limit=2)
+        assert [r['id'] for r in rows] == ids[0:2]
+        assert prev_cursor is None and next_cursor == ids[1]
+
+    def test_iter_projects_streams_rows(self):
+        """Test that iter_projects yields the same rows as get_projects."""
+        for i in range(1, 6):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+
+        streamed = [p['id'] for p in DAL.iter_projects(batch_size=2)]
+        assert streamed == [p['id'] for p in DAL.get_projects()]
+
+    def test_project_page_matches_get_projects_page(self):
+        """Test that the lazy ProjectPage agrees with get_projects_page."""
+        for i in range(1, 6):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        ids = [p['id'] for p in DAL.get_projects()]
+
+        for kwargs in ({}, {'after_id': ids[0]}, {'after_id': ids[3]}, {'before_id': ids[2]}):
+            rows, prev_cursor, next_cursor = DAL.get_projects_page(limit=1, **kwargs)
+            page = DAL.ProjectPage(limit=1, **kwargs)
+            assert [r.id for r in page] == [r['id'] for r in rows]
+            assert (page.prev_cursor, page.next_cursor) == (prev_cursor, next_cursor)
+
+    def test_project_page_empty(self):
+        """Test that an empty ProjectPage is falsy."""
+        page = DAL.ProjectPage()
+        assert not page
+        assert list(page) == []
+
+    def test_lru_cache_eviction_and_counters(self):
+        """Test LRU eviction order and hit/miss counting."""
+        cache = DAL.LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1  # 'b' is now least recently used
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 2}
+
+    def test_lru_cache_ttl(self):
+        """Test that expired entries are treated as misses."""
+        cache = DAL.LRUCache(maxsize=2, ttl=0)
+        cache.set('a', 1)
+        assert cache.get('a') is None
+        assert cache.stats()['size'] == 0
+
+    def test_get_projects_cached_until_write(self):
+        """Test that reads are cached and every DAL write invalidates them."""
+        DAL.add_project("Project 1", "Description 1", "image1.jpg")
+        DAL.project_cache.clear()
+
+        DAL.get_projects()
+        DAL.get_projects()
+        assert DAL.project_cache.stats()['hits'] == 1
+
+        DAL.add_project("Project 2", "Description 2", "image2.jpg")
+        assert len(DAL.get_projects()) == 2
+
+        project_id = DAL.get_projects()[0]['id']
+        DAL.update_project(project_id, "Renamed", "Description 2", "image2.jpg")
+        assert DAL.get_projects()[0]['title'] == "Renamed"
+
+        DAL.delete_project(project_id)
+        assert len(DAL.get_projects()) == 1
+
+    def test_single_flight_shares_one_call(self):
+        """Test that concurrent calls with one key run once and share the result."""
+        flight = DAL.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+                     for _ in range(4)]
+        for t in followers:
+            t.start()
+        while flight.shared < 4:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+
+        assert calls == [1]
+        assert results == ['result'] * 5
+        assert flight.do('k', lambda: 'again') == 'again'  # nothing kept afterwards
+
+    def test_single_flight_shares_exceptions(self):
+        """Test that a failing call raises in the caller and leaves no state behind."""
+        flight = DAL.SingleFlight()
+        with pytest.raises(ZeroDivisionError):
+            flight.do('k', lambda: 1 / 0)
+        assert flight._calls == {}
+
+    def test_get_projects_sees_external_writes(self):
+        """Test that commits from another connection invalidate the cache."""
+        DAL.add_project("Project 1", "Description 1", "image1.jpg")
+        assert len(DAL.get_projects()) == 1
+
+        conn = sqlite3.connect(DAL.DB_FILE)
+        conn.execute("INSERT INTO projects (title, description, image_file_name) VALUES ('Other', 'Worker', 'x.jpg')")
+        conn.commit()
+        conn.close()
+
+        assert len(DAL.get_projects()) == 2
+
+    def test_add_projects_bulk(self):
+        """Test chunked bulk inserts from tuples and mappings."""
+        rows = ((f"Project {i}", f"Description {i}", f"image{i}.jpg") for i in range(7))
+        assert DAL.add_projects_bulk(rows, chunk_size=3) == 7
+
+        mapping = {'title': "Mapped", 'description': "From dict", 'image_file_name': "dict.jpg"}
+        assert DAL.add_projects_bulk([mapping]) == 1
+
+        projects = DAL.get_projects()
+        assert len(projects) == 8
+        assert projects[0]['title'] == "Mapped"
+        assert projects[-1]['title'] == "Project 0"
+
+    @pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+    def test_export_import_round_trip(self, fmt):
+        """Test that exported projects import back unchanged."""
+        DAL.add_project("Project, with comma", "Line one\nline \"two\"", "one.jpg")
+        DAL.add_project("Project 2", "Description 2", "two.jpg")
+
+        stream = io.StringIO()
+        assert DAL.export_projects(stream, fmt, chunk_size=1) == 2
+
+        stream.seek(0)
+        rows = list(DAL.read_projects(stream, fmt))
+        assert [r['title'] for r in rows] == ["Project, with comma", "Project 2"]
+        assert rows[0]['description'] == "Line one\nline \"two\""
+
+        DAL.add_projects_bulk(rows)
+        assert len(DAL.get_projects()) == 4
+
+    def test_export_unknown_format(self):
+        """Test that unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            DAL.export_projects(io.StringIO(), 'xml')
+
+    def test_init_db_creates_fts_index(self):
+        """Test that init_db creates the FTS table and indexes existing rows."""
+        # Simulate a database created before the FTS index existed
+        conn = sqlite3.connect(DAL.DB_FILE)
+        for name in ('projects_fts_ai', 'projects_fts_ad', 'projects_fts_au'):
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute("DROP TABLE projects_fts")
+        conn.execute("INSERT INTO projects (title, description, image_file_name) VALUES ('Legacy Robot', 'Old row', 'x.jpg')")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        DAL.init_db()
+        assert [r['title'] for r in DAL.search_projects("robot")] == ['Legacy Robot']
+
+    def test_search_projects_ranked(self):
+        """Test ranked full-text search with prefix matching on the last word."""
+        DAL.add_project("Weather Station", "Arduino sensors for weather data", "w.jpg")
+        DAL.add_project("Neural Network", "Image classifier", "n.jpg")
+        DAL.add_project("Weather Weather Weather", "Weather dashboard", "d.jpg")
+
+        results = DAL.search_projects("weath")
+        assert [r['title'] for r in results][0] == "Weather Weather Weather"
+        assert len(results) == 2
+        assert DAL.HIGHLIGHT_START + "Weather" + DAL.HIGHLIGHT_END in results[0]['title_html']
+
+    def test_search_projects_follows_writes(self):
+        """Test that updates and deletes keep the FTS index in sync."""
+        DAL.add_project("Alpha", "First", "a.jpg")
+        project_id = DAL.get_projects()[0]['id']
+
+        DAL.update_project(project_id, "Beta", "Second", "b.jpg")
+        assert DAL.search_projects("alpha") == []
+        assert len(DAL.search_projects("beta")) == 1
+
+        DAL.delete_project(project_id)
+        assert DAL.search_projects("beta") == []
+
+    def test_search_projects_tolerates_syntax(self):
+        """Test that FTS operators in user input don't raise."""
+        DAL.add_project("C++ \"Parser\"", "AND OR NOT (tricky)", "p.jpg")
+        assert len(DAL.search_projects('"parser" (tricky')) == 1
+        assert DAL.search_projects('   ') == []
+
+    def test_write_behind_group_commit(self):
+        """Test that queued writes resolve futures and commit in batches."""
+        DAL.start_write_queue()
+        try:
+            futures = [DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+                       for i in range(50)]
+            for future in futures:
+                assert future.result(timeout=5) is None
+            assert len(DAL.get_projects()) == 50
+
+            project_id = DAL.get_projects()[0]['id']
+            DAL.update_project(project_id, "Updated", "Queued", "u.jpg").result(timeout=5)
+            assert DAL.get_projects()[0]['title'] == "Updated"
+
+            DAL.delete_project(project_id).result(timeout=5)
+            assert len(DAL.get_projects()) == 49
+        finally:
+            DAL.stop_write_queue()
+
+    def test_write_behind_isolates_failures(self):
+        """Test that a failing write only fails its own future."""
+        writer = DAL.WriteQueue()
+        try:
+            good = writer.submit(DAL._insert_project, "Good", "Row", "g.jpg")
+            bad = writer.submit(DAL._insert_project, None, "NOT NULL violation", "b.jpg")
+            also_good = writer.submit(DAL._insert_project, "Also good", "Row", "a.jpg")
+
+            assert good.result(timeout=5) is None
+            assert also_good.result(timeout=5) is None
+            with pytest.raises(sqlite3.IntegrityError):
+                bad.result(timeout=5)
+        finally:
+            writer.close()
+        assert sorted(p['title'] for p in DAL.get_projects()) == ["Also good", "Good"]
+
+    def test_stop_write_queue_flushes(self):
+        """Test that stopping the queue commits pending writes first."""
+        DAL.start_write_queue()
+        futures = [DAL.add_project(f"Project {i}", "Pending", "p.jpg") for i in range(20)]
+        DAL.stop_write_queue()
+
+        assert all(f.done() for f in futures)
+        assert len(DAL.get_projects()) == 20
+        assert DAL.add_project("Sync", "Again", "s.jpg") is None
+
+    def test_init_db_adds_timestamps_to_old_tables(self):
+        """Test that init_db migrates a table created before the timestamp columns."""
+        DAL.close_all()
+        conn = sqlite3.connect(DAL.DB_FILE)
+        conn.executescript('''
+            DROP TABLE projects;
+            CREATE TABLE projects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                image_file_name TEXT NOT NULL
+            );
+            INSERT INTO projects (title, description, image_file_name) VALUES ('Legacy', 'Old row', 'x.jpg');
+            PRAGMA user_version = 0;
+        ''')
+        conn.close()
+
+        DAL.init_db()
+        row = DAL.get_projects()[0]
+        assert row['title'] == 'Legacy'
+        assert row['created_at'] and row['updated_at']
+        assert DAL.get_project(row['id'])['version'] == 1
+
+        DAL.add_project("Fresh", "New row", "y.jpg")
+        assert DAL.get_projects()[0]['created_at']
+
+    def test_schema_created_lazily_on_first_connection(self):
+        """Test that a new database gets its schema without an init_db call."""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        DAL.close_all()
+        DAL.DB_FILE = path
+        try:
+            DAL.add_project("Lazy", "No init_db", "l.jpg")
+            assert DAL.get_projects()[0]['title'] == 'Lazy'
+            conn = DAL.get_connection()
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == DAL.SCHEMA_VERSION
+            assert DAL._migrate(conn) is False
+        finally:
+            DAL.close_all()
+            DAL.DB_FILE = self.temp_db.name
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    def test_update_project_touches_updated_at(self):
+        """Test that updates refresh updated_at but keep created_at."""
+        DAL.add_project("Project", "Description", "image.jpg")
+        conn = DAL.get_connection()
+        with conn:
+            conn.execute("UPDATE projects SET created_at = '2000-01-01', updated_at = '2000-01-01'")
+        project_id = DAL.get_projects()[0]['id']
+
+        DAL.update_project(project_id, "Project", "Changed", "image.jpg")
+        row = DAL.get_projects()[0]
+        assert row['created_at'] == '2000-01-01'
+        assert row['updated_at'] > '2000-01-01'
+
+    def test_get_projects_sorted(self):
+        """Test the title and updated sorts, with keyset cursors in both directions."""
+        titles = ['delta', 'Alpha', 'charlie', 'Bravo', 'echo']
+        for title in titles:
+            DAL.add_project(title, "Description", "image.jpg")
+        conn = DAL.get_connection()
+        with conn:
+            for day, title in enumerate(['charlie', 'echo', 'Alpha', 'delta', 'Bravo'], 1):
+                conn.execute("UPDATE projects SET updated_at = ? WHERE title = ?", (f'2024-01-0{day}', title))
+
+        by_title = [p['title'] for p in DAL.get_projects(sort='title')]
+        assert by_title == ['Alpha', 'Bravo', 'charlie', 'delta', 'echo']
+        by_updated = [p['title'] for p in DAL.get_projects(sort='updated')]
+        assert by_updated == ['Bravo', 'delta', 'Alpha', 'echo', 'charlie']
+
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(limit=2, sort='title')
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(after_id=next_cursor, limit=2, sort='title')
+        assert [r['title'] for r in rows] == ['charlie', 'delta']
+        rows, _, _ = DAL.get_projects_page(before_id=prev_cursor, limit=2, sort='title')
+        assert [r['title'] for r in rows] == ['Alpha', 'Bravo']
+
+        page = DAL.ProjectPage(limit=2, sort='updated')
+        assert [r.title for r in page] == ['Bravo', 'delta']
+        rows, _, _ = DAL.get_projects_page(after_id=page.next_cursor, limit=2, sort='updated')
+        assert [r['title'] for r in rows] == ['Alpha', 'echo']
+
+    def test_get_projects_title_prefix(self):
+        """Test the case-insensitive title prefix filter and its paging."""
+        for title in ['Robot arm', 'robot dog', 'Rover', 'Robotics kit', 'Web app']:
+            DAL.add_project(title, "Description", "image.jpg")
+
+        matches = [p['title'] for p in DAL.get_projects(sort='title', prefix='ROBOT')]
+        assert matches == ['Robot arm', 'robot dog', 'Robotics kit']
+
+        rows, _, next_cursor = DAL.get_projects_page(limit=2, sort='title', prefix='robot')
+        rows, prev_cursor, next_cursor = DAL.get_projects_page(
+            after_id=next_cursor, limit=2, sort='title', prefix='robot')
+        assert [r['title'] for r in rows] == ['Robotics kit'] and next_cursor is None
+        rows, _, _ = DAL.get_projects_page(before_id=prev_cursor, limit=2, sort='title', prefix='robot')
+        assert [r['title'] for r in rows] == ['Robot arm', 'robot dog']
+
+        with pytest.raises(ValueError):
+            DAL.get_projects(prefix='robot')
+        with pytest.raises(ValueError):
+            DAL.get_projects(sort='random')
+
+    @pytest.mark.parametrize('sort, prefix', [(sort, None) for sort in DAL.SORTS] + [('title', 'Pro')])
+    @pytest.mark.parametrize('cursor', [{}, {'after_id': 50}, {'before_id': 50}])
+    def test_listing_queries_use_an_index(self, sort, prefix, cursor):
+        """Test that no supported sort/filter/cursor combination sorts in a temp B-tree."""
+        DAL.add_projects_bulk((f"Project {i}", "Description", "image.jpg") for i in range(100))
+
+        sql, params = DAL._listing_query(sort=sort, prefix=prefix, **cursor)
+        params['limit'] = DAL.PAGE_SIZE
+        plan = [row['detail'] for row in DAL.get_connection().execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+        assert not any('TEMP B-TREE' in step for step in plan), plan
+        listing = plan[0]
+        if sort == 'newest':
+            assert listing.startswith('SCAN projects') or 'INTEGER PRIMARY KEY' in listing, plan
+        else:
+            assert f'INDEX projects_{sort}_idx' in listing, plan
+        if prefix or cursor:
+            assert listing.startswith('SEARCH'), plan
+
+    def test_summary_rows_truncate_description(self):
+        """Test that listing rows carry a bounded excerpt and only the listed columns."""
+        long_text = "x" * (DAL.EXCERPT_LENGTH + 50)
+        DAL.add_project("Long", long_text, "long.jpg")
+        DAL.add_project("Short", "Brief", "short.jpg")
+
+        short, long = DAL.get_projects(summary=True)
+        assert isinstance(short, DAL.ProjectSummary)
+        assert short.excerpt == "Brief"
+        assert long.excerpt == "x" * DAL.EXCERPT_LENGTH + "…"
+        assert short._fields == ('id', 'title', 'excerpt', 'image_file_name')
+
+        rows, _, _ = DAL.get_projects_page(limit=1, summary=True)
+        assert rows == [short]
+        assert DAL.get_project(long.id)['description'] == long_text
+        assert DAL.get_project(long.id + 100) is None
+
+    def test_update_project_bumps_version(self):
+        """Test that updates bump the row version and honour expected_version."""
+        DAL.add_project("Project", "Description", "image.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        assert DAL.get_project(project_id)['version'] == 1
+
+        DAL.update_project(project_id, "Project", "Edited", "image.jpg", expected_version=1)
+        assert DAL.get_project(project_id)['version'] == 2
+
+        with pytest.raises(DAL.StaleProjectError):
+            DAL.update_project(project_id, "Project", "Lost update", "image.jpg", expected_version=1)
+        assert DAL.get_project(project_id)['description'] == "Edited"
+
+    def test_write_behind_stale_update(self):
+        """Test that a stale update fails only its own future in write-behind mode."""
+        DAL.add_project("Project", "Description", "image.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        DAL.start_write_queue()
+        try:
+            ok = DAL.update_project(project_id, "Project", "First", "image.jpg", expected_version=1)
+            stale = DAL.update_project(project_id, "Project", "Second", "image.jpg", expected_version=1)
+            ok.result(timeout=5)
+            with pytest.raises(DAL.StaleProjectError):
+                stale.result(timeout=5)
+        finally:
+            DAL.stop_write_queue()
+        assert DAL.get_project(project_id)['description'] == "First"
+
+    def test_get_projects_selected_fields(self):
+        """Test that fields selects only the named columns, with id first."""
+        for i in range(3):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+
+        assert DAL.selected_columns(('title', 'id', 'title')) == ('id', 'title')
+        rows, _, next_cursor = DAL.get_projects_page(limit=2, fields=('title',))
+        assert rows == [(3, 'Project 2'), (2, 'Project 1')]
+        assert next_cursor == 2
+        assert list(DAL.iter_projects(after_id=2, fields=('image_file_name',))) == [(1, 'image0.jpg')]
+
+        with pytest.raises(ValueError):
+            DAL.get_projects(fields=('password',))
+
+    def test_readonly_read_mode(self):
+        """Test that readonly mode reads through a separate query-only connection."""
+        DAL.add_project("Project", "Description", "image.jpg")
+        DAL.set_read_mode('readonly')
+        try:
+            reader = DAL.get_read_connection()
+            assert reader is not DAL.get_connection()
+            assert reader.execute('PRAGMA query_only').fetchone()[0] == 1
+            with pytest.raises(sqlite3.OperationalError):
+                reader.execute("DELETE FROM projects")
+
+            DAL.add_project("Second", "Description", "image.jpg")
+            assert [p['title'] for p in DAL.get_projects()] == ["Second", "Project"]
+        finally:
+            DAL.set_read_mode('primary')
+
+    def test_replica_read_mode(self):
+        """Test that replica reads trail the primary until the replica is refreshed."""
+        DAL.add_project("Project", "Description", "image.jpg")
+        replica_file = self.temp_db.name + '.replica'
+        DAL.set_read_mode('replica', replica_file, interval=60)
+        try:
+            assert [p['title'] for p in DAL.get_projects()] == ["Project"]
+            DAL.add_project("Second", "Description", "image.jpg")
+            assert [p['title'] for p in DAL.get_projects()] == ["Project"]
+            assert DAL.get_project(2) is None and DAL.get_project(2, primary=True)
+
+            assert DAL._replica.refresh() is True
+            assert [p['title'] for p in DAL.get_projects()] == ["Second", "Project"]
+            assert DAL._replica.refresh() is False  # primary unchanged: nothing to copy
+
+            status = DAL.replica_status()
+            assert status['mode'] == 'replica' and status['refreshes'] == 2
+            assert 0 <= status['lag'] < 60
+
+            if hasattr(os, 'fork'):
+                # a forked child opens its own source connection, whose
+                # data_version restarts, so it must copy again on first refresh
+                pid = os.fork()
+                if pid == 0:
+                    fresh = DAL._replica._source_version is None and DAL._replica._confirmed_at == 0.0
+                    os._exit(0 if fresh else 1)
+                assert os.waitpid(pid, 0)[1] == 0
+        finally:
+            DAL.set_read_mode('primary')
+            DAL.close_all()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(replica_file + suffix):
+                    os.unlink(replica_file + suffix)
+        assert DAL.replica_status() == {'mode': 'primary'}
@@ -0,0 +1,193 @@
+import pytest
+import tempfile
+import shutil
+import os
+from app import create_app
+import DAL
+import images
+
+app = create_app()
+
+Image = pytest.importorskip('PIL.Image')
+
+
+class TestImages:
+    """Test cases for project image derivatives."""
+    
+    def setup_method(self):
+        """Point the image pipeline at temporary directories."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_dirs = (images.IMAGE_DIR, images.DERIVED_DIR)
+        images.IMAGE_DIR = os.path.join(self.temp_dir, 'images')
+        images.DERIVED_DIR = os.path.join(self.temp_dir, 'derived')
+        os.makedirs(images.IMAGE_DIR)
+        images._index.clear()
+        
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+        DAL.init_db()
+        
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+    
+    def teardown_method(self):
+        """Clean up after each test."""
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        os.unlink(self.temp_db.name)
+        
+        images.IMAGE_DIR, images.DERIVED_DIR = self.original_dirs
+        images._index.clear()
+        shutil.rmtree(self.temp_dir)
+    
+    def make_image(self, name, size=(800, 600), mode='RGB', color=(200, 40, 40)):
+        """Write a solid-colour test image into IMAGE_DIR."""
+        Image.new(mode, size, color).save(os.path.join(images.IMAGE_DIR, name))
+    
+    def test_image_set_generates_derivatives(self):
+        """Test that each width is written in the fallback and modern formats."""
+        self.make_image('photo.jpg')
+        result = images.image_set('photo.jpg')
+        
+        digest = images.content_hash(os.path.join(images.IMAGE_DIR, 'photo.jpg'))
+        written = sorted(os.listdir(images.DERIVED_DIR))
+        expected = [f'{digest}-{w}.{ext}' for w in images.WIDTHS
+                    for ext in ['jpg'] + [e for e, _ in images.available_formats()]]
+        assert written == sorted(expected)
+        
+        assert result.src == f'{images.DERIVED_URL}/{digest}-200.jpg'
+        assert result.srcset.endswith('-400.jpg 400w')
+        assert (result.width, result.height) == (200, 150)
+        assert [t for t, _ in result.sources] == [m for _, m in images.available_formats()]
+    
+    def test_transparent_image_keeps_png_fallback(self):
+        """Test that images with alpha fall back to PNG, not JPEG."""
+        self.make_image('logo.png', mode='RGBA', color=(0, 0, 0, 0))
+        assert images.image_set('logo.png').src.endswith('-200.png')
+    
+    def test_small_image_is_not_upscaled(self):
+        """Test that images narrower than every width keep their size."""
+        self.make_image('tiny.png', size=(120, 90))
+        result = images.image_set('tiny.png')
+        assert result.srcset == f'{result.src} 120w'
+    
+    def test_image_set_is_cached_until_file_changes(self):
+        """Test that unchanged files reuse their ImageSet and edits get new URLs."""
+        self.make_image('photo.jpg')
+        first = images.image_set('photo.jpg')
+        assert images.image_set('photo.jpg') is first
+        
+        self.make_image('photo.jpg', size=(640, 480), color=(10, 10, 200))
+        path = os.path.join(images.IMAGE_DIR, 'photo.jpg')
+        os.utime(path, ns=(1, 1))
+        images.catalog().refresh(force=True)  # in-place edits wait for the next sweep
+        assert images.image_set('photo.jpg').src != first.src
+    
+    def test_catalog_indexes_images(self):
+        """Test that the catalog records size, dimensions, hash and mtime."""
+        self.make_image('photo.jpg', size=(640, 480))
+        path = os.path.join(images.IMAGE_DIR, 'photo.jpg')
+        
+        info = images.image_info('photo.jpg')
+        assert (info.name, info.width, info.height) == ('photo.jpg', 640, 480)
+        assert info.size == os.path.getsize(path)
+        assert info.digest == images.content_hash(path)
+        assert info.mtime_ns == os.stat(path).st_mtime_ns
+        assert images.image_info('missing.jpg') is None
+        assert images.image_info('../secret.jpg') is None
+        assert images.image_names() == ['photo.jpg']
+    
+    def test_catalog_refreshes_incrementally(self):
+        """Test that a re-list happens only when the directory changes and reuses unchanged entries."""
+        self.make_image('a.jpg')
+        catalog = images.Catalog(images.IMAGE_DIR, check_interval=0)
+        first = catalog.get('a.jpg')
+        assert catalog.scans == 1
+        
+        assert catalog.refresh() is False  # directory untouched
+        assert catalog.version == 1
+        
+        self.make_image('b.jpg')
+        os.utime(images.IMAGE_DIR, ns=(1, 1))  # make the change visible at any mtime resolution
+        assert catalog.get('b.jpg') is not None
+        assert catalog.get('a.jpg') is first
+        assert catalog.scans == 2 and catalog.version == 2
+        
+        assert catalog.refresh(force=True) is True
+        assert catalog.version == 2  # re-listed, but nothing changed
+        
+        os.unlink(os.path.join(images.IMAGE_DIR, 'a.jpg'))
+        assert catalog.get('a.jpg') is None
+    
+    def test_listing_makes_no_stat_calls(self, monkeypatch):
+        """Test that rendering a page of images stays off the filesystem once catalogued."""
+        self.make_image('photo.jpg')
+        DAL.add_project('Pictured', 'Has an image', 'photo.jpg')
+        DAL.add_project('Broken', 'Missing image', 'missing.jpg')
+        assert self.client.get('/projects').status_code == 200  # warm catalog and derivatives
+        
+        def no_stat(*args, **kwargs):
+            raise AssertionError('os.stat called during render')
+        monkeypatch.setattr(images.os, 'stat', no_stat)
+        monkeypatch.setattr(images.os, 'scandir', no_stat)
+        
+        response = self.client.get('/projects?limit=50')
+        assert response.status_code == 200
+        assert b'width="200" height="150"' in response.data
+        assert b'missing.jpg' not in response.data  # placeholder, not a broken <img>
+    
+    def test_form_rejects_unknown_image(self):
+        """Test that /form and the JSON API refuse image names not in the catalog."""
+        self.make_image('photo.jpg')
+        response = self.client.post('/form', data={
+            'title': 'Typo', 'description': 'Wrong name', 'image_file_name': 'phot.jpg'
+        })
+        assert response.status_code == 400
+        assert 'No image named “phot.jpg”'.encode() in response.data
+        assert b'value="Typo"' in response.data
+        assert DAL.get_projects() == []
+        
+        DAL.add_project('Api', 'Description', 'photo.jpg')
+        project_id = DAL.get_projects()[0]['id']
+        response = self.client.put(f'/api/projects/{project_id}', json={
+            'title': 'Api', 'description': 'Edited', 'image_file_name': 'gone.png'
+        })
+        assert response.status_code == 400
+        assert DAL.get_project(project_id)['image_file_name'] == 'photo.jpg'
+    
+    def test_image_set_missing_or_invalid(self):
+        """Test that missing, unreadable or out-of-tree files return None."""
+        with open(os.path.join(images.IMAGE_DIR, 'broken.jpg'), 'wb') as f:
+            f.write(b'not an image')
+        
+        assert images.image_set('missing.jpg') is None
+        assert images.image_set('broken.jpg') is None
+        assert images.image_set('../secret.jpg') is None
+        assert images.image_set('') is None
+    
+    def test_projects_page_uses_picture(self):
+        """Test that the projects page emits srcset, sizes and lazy loading."""
+        self.make_image('photo.jpg')
+        self.client.post('/form', data={
+            'title': 'Pictured', 'description': 'Has derivatives', 'image_file_name': 'photo.jpg'
+        })
+        assert os.listdir(images.DERIVED_DIR)  # generated when the project was added
+        
+        response = self.client.get('/projects')
+        assert b'<picture>' in response.data
+        assert b'srcset="' in response.data
+        assert b'sizes="200px"' in response.data
+        assert b'loading="lazy"' in response.data
+    
+    def test_backfill_command(self):
+        """Test that 'flask images backfill' builds derivatives for existing rows."""
+        self.make_image('photo.jpg')
+        DAL.add_project('Old', 'Before the pipeline', 'photo.jpg')
+        DAL.add_project('Gone', 'Missing image', 'missing.jpg')
+        
+        result = app.test_cli_runner().invoke(args=['images', 'backfill'])
+        assert result.exit_code == 0
+        assert '1 of 2' in result.output
+        assert os.listdir(images.DERIVED_DIR)
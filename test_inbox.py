@@ -0,0 +1,133 @@
+import pytest
+import tempfile
+import os
+import time
+from app import create_app
+import DAL
+import inbox
+
+app = create_app()
+
+class TestInbox:
+    """Test cases for contact message intake and background processing."""
+
+    def setup_method(self):
+        """Set up a temporary database and test client for each test."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+        DAL.init_db()
+
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.notified = []
+
+    def teardown_method(self):
+        """Clean up after each test."""
+        inbox.stop_worker()
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+
+    def post(self, email='ada@example.com', message='I would like to collaborate on a project.'):
+        return self.client.post('/contact', data={
+            'firstName': 'Ada', 'lastName': 'Lovelace', 'email': email, 'message': message,
+        })
+
+    def status(self, message_id):
+        return DAL.get_messages([message_id])[message_id]['status']
+
+    def test_contact_post_queues_message(self):
+        """Test that POST /contact stores the message and queues one job."""
+        response = self.post()
+        assert response.status_code == 302
+        assert response.location.endswith('/thankyou')
+
+        (message,) = DAL.get_messages([1]).values()
+        assert message['email'] == 'ada@example.com'
+        assert message['status'] == 'new'
+        assert DAL.job_counts() == {'queued': 1, 'due': 1, 'dead': 0}
+
+    def test_empty_contact_post_stores_nothing(self):
+        """Test that a blank submission still redirects but queues no job."""
+        assert self.client.post('/contact').status_code == 302
+        assert DAL.get_messages([1]) == {}
+        assert DAL.job_counts()['queued'] == 0
+
+    def test_process_pending_delivers_and_notifies(self):
+        """Test that a clean message is delivered and its job removed."""
+        self.post()
+        assert inbox.process_pending(notify=self.notified.append) == 1
+
+        assert [m['id'] for m in self.notified] == [1]
+        assert self.status(1) == 'delivered'
+        assert DAL.job_counts() == {'queued': 0, 'due': 0, 'dead': 0}
+
+    def test_spam_is_not_notified(self):
+        """Test that spammy messages are marked spam instead of delivered."""
+        self.post(message='WINNER!!! Cheap crypto loan at http://spam.example and www.spam.example')
+        inbox.process_pending(notify=self.notified.append)
+
+        assert self.notified == []
+        assert self.status(1) == 'spam'
+        assert DAL.get_messages([1])[1]['spam_score'] >= inbox.SPAM_THRESHOLD
+
+    def test_duplicates_are_dropped(self):
+        """Test that a repeated message is delivered once, across and within batches."""
+        self.post()
+        inbox.process_pending(notify=self.notified.append)
+        self.post(message='I would like to   COLLABORATE on a project.')
+        self.post()
+        inbox.process_pending(notify=self.notified.append)
+
+        assert len(self.notified) == 1
+        assert [self.status(i) for i in (1, 2, 3)] == ['delivered', 'duplicate', 'duplicate']
+
+        self.post(email='grace@example.com')
+        inbox.process_pending(notify=self.notified.append)
+        assert self.status(4) == 'delivered'
+
+    def test_failed_notification_is_retried_later(self):
+        """Test that a failing notifier leaves the job queued with backoff."""
+        self.post()
+
+        def broken(message):
+            raise ConnectionError('mail server down')
+
+        assert inbox.process_pending(notify=broken) == 0
+        assert self.status(1) == 'new'
+        assert DAL.job_counts() == {'queued': 1, 'due': 0, 'dead': 0}
+        assert DAL.claim_jobs('message') == []
+
+    def test_job_marked_dead_after_max_attempts(self):
+        """Test that a job failing JOB_MAX_ATTEMPTS times stops being retried."""
+        self.post()
+        (job,) = DAL.claim_jobs('message')
+        DAL.fail_job(job._replace(attempts=DAL.JOB_MAX_ATTEMPTS), 'gave up')
+        assert DAL.job_counts() == {'queued': 0, 'due': 0, 'dead': 1}
+
+    def test_claims_are_exclusive_until_lease_expires(self):
+        """Test that a claimed job is hidden until its lease runs out."""
+        self.post()
+        (job,) = DAL.claim_jobs('message', lease=60)
+        assert job.attempts == 1
+        assert DAL.claim_jobs('message') == []
+
+        DAL.add_message('Bo', 'B', 'bo@example.com', 'Hello')
+        (expired,) = DAL.claim_jobs('message', lease=-1)
+        assert expired.ref_id == 2
+        (again,) = DAL.claim_jobs('message')
+        assert (again.ref_id, again.attempts) == (2, 2)
+
+    def test_background_worker_processes_messages(self):
+        """Test that the worker thread picks up a message after a POST."""
+        inbox.start_worker(notify=self.notified.append, interval=5)
+        self.post()
+
+        deadline = time.monotonic() + 2
+        while not self.notified and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [m['id'] for m in self.notified] == [1]
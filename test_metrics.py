@@ -0,0 +1,104 @@
+import pytest
+import os
+import tempfile
+from app import create_app
+import DAL
+import metrics
+
+
+class TestMetrics:
+    """Test cases for request instrumentation and the /metrics endpoint."""
+    
+    def setup_method(self):
+        """Set up an instrumented app on a temporary database."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+        DAL.init_db()
+        
+        self.app = create_app({'TESTING': True, 'METRICS': True, 'SERVER_TIMING': True})
+        self.client = self.app.test_client()
+        metrics.registry.clear()
+    
+    def teardown_method(self):
+        """Remove instrumentation and clean up."""
+        metrics.uninstall()
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_metrics_endpoint_exposes_timings(self):
+        """Test that views, DAL calls, SQL and templates are all recorded."""
+        DAL.add_project("Measured", "Project", "m.jpg")
+        self.client.get('/projects?limit=5')
+        
+        response = self.client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.data.decode()
+        
+        assert 'http_request_duration_seconds_count{endpoint="projects",method="GET",status="200"} 1' in text
+        assert 'http_response_size_bytes_bucket{endpoint="projects",le="+Inf"} 1' in text
+        assert 'dal_call_duration_seconds_count{function="add_project"} 1' in text
+        assert 'dal_call_duration_seconds_count{function="ProjectPage"} 1' in text
+        assert 'dal_call_duration_seconds_count{function="iter_projects"} 1' in text
+        assert 'template_render_duration_seconds_count{template="projects.html"} 1' in text
+        assert '# TYPE sql_queries_total counter' in text
+        assert 'dal_cache_requests_total{cache="projects",result="miss"}' in text
+    
+    def test_server_timing_header(self):
+        """Test the per-response Server-Timing breakdown."""
+        response = self.client.get('/projects/search?q=robot')
+        timing = response.headers['Server-Timing']
+        assert timing.startswith('db;dur=')
+        assert 'desc="1 queries"' in timing
+        assert 'render;dur=' in timing and 'app;dur=' in timing
+    
+    def test_listing_query_is_counted(self):
+        """Test that the keyset listing SELECT goes through the timed execute."""
+        DAL.add_project("Listed", "Project", "project.jpg")
+        queries = metrics.registry._metrics['sql_queries_total'][3]
+        before = queries.get((), 0)
+        assert [p['title'] for p in DAL.iter_projects()] == ['Listed']
+        assert queries.get((), 0) == before + 1
+        
+        # A cold page: the data_version check plus the listing query
+        response = self.client.get('/projects')
+        assert 'desc="2 queries"' in response.headers['Server-Timing']
+    
+    def test_disabled_app_is_not_instrumented(self):
+        """Test that METRICS off leaves DAL, SQL and routes untouched."""
+        metrics.uninstall()
+        original = DAL.get_projects
+        
+        app = create_app({'TESTING': True})
+        client = app.test_client()
+        assert client.get('/metrics').status_code == 404
+        assert 'Server-Timing' not in client.get('/').headers
+        assert DAL.get_projects is original
+        assert 'execute' not in DAL._Connection.__dict__
+    
+    def test_uninstall_restores_originals(self):
+        """Test that uninstall undoes every wrapper."""
+        assert DAL.get_projects.__wrapped__ is not None
+        metrics.uninstall()
+        assert not hasattr(DAL.get_projects, '__wrapped__')
+        assert not hasattr(DAL.iter_projects, '__wrapped__')
+        assert not hasattr(DAL.ProjectPage.__init__, '__wrapped__')
+        assert 'execute' not in DAL._Connection.__dict__
+    
+    def test_registry_render_format(self):
+        """Test histogram buckets are cumulative and label values escaped."""
+        registry = metrics.Registry()
+        registry.histogram('demo_seconds', 'Demo.', buckets=(0.1, 1.0))
+        registry.observe('demo_seconds', 0.05, path='/a"b')
+        registry.observe('demo_seconds', 0.5, path='/a"b')
+        
+        lines = registry.render().splitlines()
+        assert lines[:2] == ['# HELP demo_seconds Demo.', '# TYPE demo_seconds histogram']
+        assert 'demo_seconds_bucket{path="/a\\"b",le="0.1"} 1' in lines
+        assert 'demo_seconds_bucket{path="/a\\"b",le="1.0"} 2' in lines
+        assert 'demo_seconds_bucket{path="/a\\"b",le="+Inf"} 2' in lines
+        assert 'demo_seconds_count{path="/a\\"b"} 2' in lines
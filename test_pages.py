@@ -0,0 +1,65 @@
+import pytest
+import gzip
+import os
+from app import create_app, STATIC_PAGES
+import pages
+
+app = create_app()
+
+
+class TestPages:
+    """Test cases for pre-rendered static pages."""
+    
+    def setup_method(self):
+        """Set up test environment for each test."""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+    
+    def test_pages_prerendered_at_startup(self):
+        """Test that PRERENDER_PAGES renders every static page in create_app."""
+        pages._pages.clear()
+        create_app({'PRERENDER_PAGES': True})
+        for name in STATIC_PAGES:
+            assert name in pages._pages
+    
+    def test_page_validators(self):
+        """Test that static pages carry ETag, Last-Modified and no-cache."""
+        response = self.client.get('/about')
+        assert response.status_code == 200
+        assert response.headers['ETag']
+        assert response.last_modified is not None
+        assert response.cache_control.no_cache
+    
+    def test_if_none_match_returns_304(self):
+        """Test revalidation by ETag."""
+        etag = self.client.get('/').headers['ETag']
+        response = self.client.get('/', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+    
+    def test_if_modified_since_returns_304(self):
+        """Test revalidation by Last-Modified."""
+        last_modified = self.client.get('/resume').headers['Last-Modified']
+        response = self.client.get('/resume', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+    
+    def test_page_served_compressed(self):
+        """Test that the precompressed body is sent when gzip is accepted."""
+        plain = self.client.get('/thankyou').data
+        response = self.client.get('/thankyou', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.data) == plain
+    
+    def test_page_rerendered_when_template_changes(self):
+        """Test that touching a template (or its base) re-renders the page."""
+        with app.test_request_context():
+            page = pages.get_page('contact.html')
+            assert pages.get_page('contact.html') is page
+            
+            base = os.path.join(app.root_path, 'templates', 'base.html')
+            stat = os.stat(base)
+            try:
+                os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+                assert pages.get_page('contact.html') is not page
+            finally:
+                os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns))
@@ -1,8 +1,13 @@
 import pytest
 import tempfile
 import os
-from app import app
+import app as app_module
+from app import create_app
 import DAL
+import assets
+import images
+
+app = create_app()
 
 class TestProjectsPage:
     """Test cases for the projects page functionality."""
@@ -26,6 +31,9 @@ class TestProjectsPage:
     
     def teardown_method(self):
         """Clean up after each test."""
+        # Close pooled connections so SQLite can clean up its WAL files
+        DAL.close_all()
+        
         # Restore original DB_FILE
         DAL.DB_FILE = self.original_db_file
         
@@ -144,3 +152,284 @@ class TestProjectsPage:
         
         # Should still load successfully with many projects
         assert b'Project 49' in response.data  # Newest project should be visible
+    
+    def test_projects_pagination(self):
+        """Test that /projects pages with cursor and limit parameters."""
+        for i in range(5):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        
+        response = self.client.get('/projects?limit=2')
+        assert b'Project 4' in response.data
+        assert b'Project 2' not in response.data
+        
+        next_id = DAL.get_projects()[1]['id']
+        assert f'cursor={next_id}'.encode() in response.data
+        
+        response = self.client.get(f'/projects?cursor={next_id}&limit=2')
+        assert b'Project 2' in response.data
+        assert b'Project 1' in response.data
+        assert b'Project 3' not in response.data
+        assert b'rel="prev"' in response.data
+    
+    def test_projects_limit_is_clamped(self):
+        """Test that the page size is bounded."""
+        for i in range(DAL.MAX_PAGE_SIZE + 1):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        
+        response = self.client.get('/projects?limit=100000')
+        assert response.status_code == 200
+        assert response.data.count(b'/delete_project/') == DAL.MAX_PAGE_SIZE
+    
+    def test_projects_streaming_matches_buffered(self):
+        """Test that the streamed projects page is byte-identical to the buffered one."""
+        for i in range(5):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        
+        for query in ('', '?limit=2', '?cursor=4&limit=2', '?before=2&limit=2'):
+            buffered = self.client.get('/projects' + query).data
+            app.config['STREAM_PROJECTS'] = True
+            try:
+                response = self.client.get('/projects' + query)
+                assert response.is_streamed
+                assert response.data == buffered
+            finally:
+                app.config['STREAM_PROJECTS'] = False
+    
+    def test_projects_page_cache(self, monkeypatch):
+        """Test that rendered pages are cached and invalidated by writes, assets and images."""
+        from app import page_cache
+        DAL.add_project("Cached Project", "Description", "cached.jpg")
+        page_cache.clear()
+        
+        self.client.get('/projects')
+        self.client.get('/projects')
+        assert page_cache.stats()['hits'] == 1
+        
+        DAL.add_project("Fresh Project", "Description", "fresh.jpg")
+        response = self.client.get('/projects')
+        assert b'Fresh Project' in response.data
+        
+        # a redeploy with new asset fingerprints, then an image added or edited
+        misses = page_cache.stats()['misses']
+        monkeypatch.setattr(assets, '_manifest_digest', 'redeployed')
+        self.client.get('/projects')
+        monkeypatch.setattr(images.catalog(), 'version', images.catalog_version() + 1)
+        self.client.get('/projects')
+        assert page_cache.stats()['misses'] == misses + 2
+    
+    def test_projects_sort_and_prefix_params(self):
+        """Test the sort and prefix query parameters and that pager links keep them."""
+        for title in ['Robot arm', 'Web app', 'robot dog', 'Rover']:
+            DAL.add_project(title, "Description", "image.jpg")
+        
+        response = self.client.get('/projects?sort=title&limit=2')
+        assert response.data.index(b'Robot arm') < response.data.index(b'robot dog')
+        assert b'Web app' not in response.data
+        assert b'sort=title' in response.data
+        
+        response = self.client.get('/projects?prefix=rob')
+        assert b'Robot arm' in response.data and b'robot dog' in response.data
+        assert b'Rover' not in response.data and b'Web app' not in response.data
+        
+        response = self.client.get('/projects?prefix=rob&limit=1')
+        assert b'prefix=rob' in response.data and b'sort=title' in response.data
+        
+        response = self.client.get('/projects?sort=bogus')
+        assert response.status_code == 200
+        assert response.data.index(b'Rover') < response.data.index(b'Robot arm')
+    
+    def test_project_detail_route(self):
+        """Test that the listing shows an excerpt and the detail page the full description."""
+        long_text = "Intro. " + "y" * DAL.EXCERPT_LENGTH + " Ending."
+        DAL.add_project("Detailed", long_text, "detail.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        
+        response = self.client.get('/projects')
+        assert b'Intro.' in response.data
+        assert b'Ending.' not in response.data
+        assert f'/projects/{project_id}"'.encode() in response.data
+        
+        response = self.client.get(f'/projects/{project_id}')
+        assert response.status_code == 200
+        assert b'Ending.' in response.data
+        
+        assert self.client.get(f'/projects/{project_id + 1}').status_code == 404
+    
+    def test_project_detail_etag(self):
+        """Test that detail pages revalidate with 304 until the project is updated."""
+        DAL.add_project("Versioned", "Description", "v.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        
+        for url in (f'/projects/{project_id}', f'/api/projects/{project_id}'):
+            response = self.client.get(url)
+            etag = response.headers['ETag']
+            assert self.client.get(url, headers={'If-None-Match': etag}).status_code == 304
+            
+            gzipped = self.client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+            response = self.client.get(url, headers={'If-None-Match': gzipped, 'Accept-Encoding': 'gzip'})
+            assert response.status_code in (200, 304) and response.headers['ETag'] == gzipped
+        
+        DAL.update_project(project_id, "Versioned", "Changed", "v.jpg")
+        response = self.client.get(f'/api/projects/{project_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['version'] == 2
+    
+    def test_project_page_etag_tracks_templates_and_assets(self, monkeypatch):
+        """Test that template, asset and image changes give the HTML page a new ETag."""
+        monkeypatch.setattr(app_module, 'TEMPLATE_CHECK_INTERVAL', 0)
+        DAL.add_project("Styled", "Description", "project.jpg")
+        url = f"/projects/{DAL.get_projects()[0]['id']}"
+        etag = self.client.get(url).headers['ETag']
+        assert self.client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        
+        template = os.path.join(app.root_path, app.template_folder, 'project.html')
+        st = os.stat(template)
+        try:
+            os.utime(template, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+        finally:
+            os.utime(template, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert self.client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        
+        monkeypatch.setattr(assets, '_manifest_digest', 'redeployed')
+        assert self.client.get(url, headers={'If-None-Match': etag}).status_code == 200
+        monkeypatch.undo()
+        
+        # project.jpg replaced on disk: the catalog has a new digest for it
+        info = images.image_info('project.jpg')
+        monkeypatch.setattr(images, 'image_info', lambda name: info._replace(digest='0' * 16))
+        assert self.client.get(url, headers={'If-None-Match': etag}).status_code == 200
+    
+    def test_render_token_lists_templates_once_per_interval(self, monkeypatch):
+        """Test that project pages re-read the template folder at most once per check interval."""
+        DAL.add_project("Styled", "Description", "project.jpg")
+        url = f"/projects/{DAL.get_projects()[0]['id']}"
+        listings = []
+        scandir = os.scandir
+        monkeypatch.setattr(app_module.os, 'scandir', lambda path: listings.append(path) or scandir(path))
+        monkeypatch.setattr(app_module, '_template_files', (float('-inf'), ()))
+        monkeypatch.setattr(app_module, 'TEMPLATE_CHECK_INTERVAL', 60)
+        for _ in range(3):
+            assert self.client.get(url).status_code == 200
+        assert listings.count(os.path.join(app.root_path, app.template_folder)) == 1
+    
+    def test_project_api_put_if_match(self):
+        """Test optimistic concurrency on the JSON endpoint."""
+        DAL.add_project("Api", "Description", "api.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        url = f'/api/projects/{project_id}'
+        etag = self.client.get(url).headers['ETag']
+        body = {'title': 'Api', 'description': 'Edited', 'image_file_name': 'project.jpg'}
+        
+        response = self.client.put(url, json=body, headers={'If-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['description'] == 'Edited'
+        assert response.headers['ETag'] != etag
+        
+        response = self.client.put(url, json=dict(body, description='Lost'), headers={'If-Match': etag})
+        assert response.status_code == 412
+        assert DAL.get_project(project_id)['description'] == 'Edited'
+        
+        assert self.client.put(url, json={'title': 'Api'}).status_code == 400
+        for body in ([1, 2], 'x', 3, None):
+            assert self.client.put(url, json=body).status_code == 400
+        assert self.client.put(url, data='not json', content_type='application/json').status_code == 400
+        assert self.client.get('/api/projects/999999').status_code == 404
+    
+    def test_edit_project_form(self):
+        """Test the edit form saves changes and refuses to overwrite a newer version."""
+        DAL.add_project("Editable", "Description", "edit.jpg")
+        project_id = DAL.get_projects()[0]['id']
+        
+        response = self.client.get(f'/projects/{project_id}/edit')
+        assert response.status_code == 200
+        assert b'value="Editable"' in response.data
+        assert b'name="version" value="1"' in response.data
+        
+        form = {'title': 'Edited', 'description': 'New text', 'image_file_name': 'project.jpg', 'version': '1'}
+        response = self.client.post(f'/projects/{project_id}/edit', data=form)
+        assert response.status_code == 302
+        assert DAL.get_project(project_id)['title'] == 'Edited'
+        
+        response = self.client.post(f'/projects/{project_id}/edit', data=dict(form, title='Stale'))
+        assert response.status_code == 409
+        assert b'value="Edited"' in response.data
+        assert DAL.get_project(project_id)['title'] == 'Edited'
+    
+    def test_projects_api_page(self):
+        """Test the paginated JSON listing with field selection."""
+        for i in range(3):
+            DAL.add_project(f"Project {i}", f"Description {i}", f"image{i}.jpg")
+        
+        data = self.client.get('/api/projects?limit=2&fields=id,title').get_json()
+        assert data['projects'] == [{'id': 3, 'title': 'Project 2'}, {'id': 2, 'title': 'Project 1'}]
+        assert data['prev_cursor'] is None and data['next_cursor'] == 2
+        
+        data = self.client.get(f"/api/projects?cursor={data['next_cursor']}").get_json()
+        assert [p['title'] for p in data['projects']] == ['Project 0']
+        assert set(data['projects'][0]) == set(DAL.PROJECT_FIELDS)
+        
+        response = self.client.get('/api/projects?fields=title,secret')
+        assert response.status_code == 400
+    
+    def test_projects_api_ndjson_stream(self):
+        """Test that NDJSON output is streamed, gzipped and covers every row."""
+        import gzip
+        import json
+        DAL.add_projects_bulk((f"Project {i}", "Description", "image.jpg") for i in range(600))
+        
+        response = self.client.get('/api/projects?format=ndjson&fields=title')
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 600
+        assert json.loads(lines[0]) == {'title': 'Project 599'}
+        
+        response = self.client.get('/api/projects?limit=5&cursor=100',
+                                   headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        records = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+        assert [r['id'] for r in records] == [99, 98, 97, 96, 95]
+    
+    def test_projects_search_route(self):
+        """Test the search page highlights matches and escapes HTML."""
+        DAL.add_project("Robot <Arm>", "Servo control", "robot.jpg")
+        DAL.add_project("Web App", "Flask site", "web.jpg")
+        
+        response = self.client.get('/projects/search?q=robot')
+        assert response.status_code == 200
+        assert b'<mark>Robot</mark> &lt;Arm&gt;' in response.data
+        assert b'Web App' not in response.data
+        
+        response = self.client.get('/projects/search')
+        assert response.status_code == 200
+    
+    def test_project_rows_use_css_classes(self):
+        """Test that rows come from the macro with classes, not inline styles."""
+        DAL.add_project("Robot <Arm>", "Servo control", "project.jpg")
+        
+        response = self.client.get('/projects')
+        rows = response.data.split(b'<tbody>')[1].split(b'</tbody>')[0]
+        assert b'<a href="/projects/1">Robot &lt;Arm&gt;</a>' in rows
+        assert b'class="btn-delete"' in rows
+        assert b'style=' not in rows
+        assert b'onmouseover' not in rows
+    
+    def test_template_bytecode_cache(self, tmp_path):
+        """Test that compiled templates are written to and reused from TEMPLATE_CACHE_DIR."""
+        DAL.add_project("Cached", "Description", "project.jpg")
+        first = create_app({'TESTING': True, 'TEMPLATE_CACHE_DIR': str(tmp_path)})
+        assert first.test_client().get('/projects').status_code == 200
+        written = {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()}
+        assert len(written) >= 3  # projects.html, _project_row.html, base.html
+        
+        # A fresh app (a restarted worker) loads the bytecode without rewriting it
+        second = create_app({'TESTING': True, 'TEMPLATE_CACHE_DIR': str(tmp_path)})
+        second.jinja_env.get_template('projects.html')
+        second.jinja_env.get_template('_project_row.html')
+        assert {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()} == written
+        
+        uncached = create_app({'TESTING': True, 'TEMPLATE_BYTECODE_CACHE': False})
+        assert uncached.jinja_env.bytecode_cache is None
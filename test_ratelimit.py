@@ -0,0 +1,87 @@
+import pytest
+import tempfile
+import os
+from app import create_app
+import DAL
+import ratelimit
+
+app = create_app({'WRITE_RATE': 1.0, 'WRITE_BURST': 3})
+
+class TestRateLimit:
+    """Test cases for token-bucket limiting of write routes."""
+
+    def setup_method(self):
+        """Set up a temporary database and fresh buckets for each test."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+        DAL.init_db()
+
+        app.config['TESTING'] = True
+        ratelimit.init_app(app)
+        self.client = app.test_client()
+
+    def teardown_method(self):
+        """Clean up after each test."""
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+
+    def test_memory_bucket_allows_burst_then_refills(self):
+        """Test that a bucket allows burst takes, then waits 1/rate per token."""
+        buckets = ratelimit.MemoryBuckets(rate=2.0, burst=2)
+        assert buckets.take('a') == 0
+        assert buckets.take('a') == 0
+        assert buckets.take('a') == pytest.approx(0.5, abs=0.05)
+        assert buckets.take('b') == 0  # clients do not share buckets
+
+    def test_memory_buckets_are_bounded(self):
+        """Test that the least recently used client buckets are evicted."""
+        buckets = ratelimit.MemoryBuckets(rate=1.0, burst=1, max_clients=2)
+        for key in ('a', 'b', 'c'):
+            buckets.take(key)
+        assert list(buckets._buckets) == ['b', 'c']
+
+    def test_sqlite_buckets_shared_between_instances(self):
+        """Test that two limiters on one file (e.g. two workers) share a budget."""
+        path = self.temp_db.name + '.limits.db'
+        try:
+            first = ratelimit.SQLiteBuckets(path, rate=0.01, burst=2)
+            second = ratelimit.SQLiteBuckets(path, rate=0.01, burst=2)
+            assert first.take('client') == 0
+            assert second.take('client') == 0
+            assert first.take('client') > 90
+            assert second.take('other') == 0
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    def test_write_route_returns_429_with_retry_after(self):
+        """Test that writes past the burst get 429 and nothing is written."""
+        data = {'title': 'T', 'description': 'D', 'image_file_name': 'project.jpg'}
+        for _ in range(3):
+            assert self.client.post('/form', data=data).status_code == 302
+        response = self.client.post('/form', data=data)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        assert len(DAL.get_projects()) == 3
+
+        assert self.client.post('/delete_project/1').status_code == 429
+
+    def test_reads_are_not_limited(self):
+        """Test that GETs, including of write routes, never spend tokens."""
+        for _ in range(10):
+            assert self.client.get('/form').status_code == 200
+            assert self.client.get('/projects').status_code == 200
+        assert self.client.post('/contact').status_code == 302
+
+    def test_zero_rate_disables_limiting(self):
+        """Test that WRITE_RATE = 0 leaves write routes unlimited."""
+        unlimited = create_app({'TESTING': True, 'WRITE_RATE': 0})
+        client = unlimited.test_client()
+        for _ in range(40):
+            assert client.post('/contact').status_code == 302
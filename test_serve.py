@@ -0,0 +1,82 @@
+import pytest
+import tempfile
+import os
+from types import SimpleNamespace
+
+pytest.importorskip('gunicorn')
+import DAL
+import inbox
+import serve
+
+
+class TestServe:
+    """Test cases for the production server settings."""
+    
+    def setup_method(self):
+        """Point DAL at a temporary database so loading the app leaves projects.db alone."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.original_db_file = DAL.DB_FILE
+        DAL.DB_FILE = self.temp_db.name
+    
+    def teardown_method(self):
+        """Stop background threads the app started and remove the database."""
+        inbox.stop_worker()
+        DAL.set_read_mode('primary')
+        DAL.close_all()
+        DAL.DB_FILE = self.original_db_file
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+    
+    def test_defaults_scale_with_cpu_count(self, monkeypatch):
+        """Test default bind, worker count and worker class."""
+        monkeypatch.setattr(serve.multiprocessing, 'cpu_count', lambda: 4)
+        options = serve.options_from_env({})
+        assert options['bind'] == '0.0.0.0:5000'
+        assert options['workers'] == 9
+        assert options['worker_class'] == 'gthread'
+        assert options['preload_app'] is False
+        assert 'accesslog' not in options
+    
+    def test_environment_overrides(self):
+        """Test that environment variables control concurrency and preload."""
+        options = serve.options_from_env({
+            'HOST': '127.0.0.1', 'PORT': '8000', 'WEB_CONCURRENCY': '3',
+            'THREADS': '1', 'PRELOAD_APP': 'true', 'MAX_REQUESTS': '1000', 'ACCESS_LOG': '-',
+        })
+        assert options['bind'] == '127.0.0.1:8000'
+        assert options['workers'] == 3
+        assert options['threads'] == 1
+        assert options['worker_class'] == 'sync'
+        assert options['preload_app'] is True
+        assert options['max_requests'] == 1000
+        assert options['accesslog'] == '-'
+    
+    def test_load_builds_app_without_open_connections(self):
+        """Test that loading the app leaves no SQLite handle to inherit."""
+        app = serve.Server({'bind': '127.0.0.1:0'}).load()
+        assert app.name == 'app'
+        assert DAL.DB_FILE == self.temp_db.name
+        assert getattr(serve.DAL._local, 'conn', None) is None
+        assert serve.DAL._pool == []
+    
+    def test_inbox_worker_starts_in_workers_not_master(self, monkeypatch):
+        """Test that load() starts no inbox thread and post_worker_init does."""
+        monkeypatch.setenv('FLASK_INBOX_WORKER', 'true')
+        server = serve.Server({'bind': '127.0.0.1:0'})
+        server.load()
+        assert inbox._worker is None
+        assert server.cfg.post_worker_init is serve.post_worker_init
+        
+        serve.post_worker_init(SimpleNamespace(app=server))
+        assert inbox._worker is not None
+    
+    def test_inbox_worker_can_be_disabled(self):
+        """Test that inbox_worker=False (FLASK_INBOX_WORKER=false) starts no thread."""
+        server = serve.Server({'bind': '127.0.0.1:0'}, inbox_worker=False)
+        server.load()
+        serve.post_worker_init(SimpleNamespace(app=server))
+        assert inbox._worker is None
+        assert serve._env_bool({'FLASK_INBOX_WORKER': 'false'}, 'FLASK_INBOX_WORKER', True) is False
+        assert serve._env_bool({}, 'FLASK_INBOX_WORKER', True) is True